@@ -1,15 +1,24 @@
 import asyncio
+import collections
+import os
+import queue
+import sys
+import threading
+import time
 from datetime import datetime
-from aiofile import async_open as open
+import httpx
 from dotenv import load_dotenv
-from livekit.agents import AutoSubscribe, JobContext, WorkerOptions, cli, llm
+from livekit.agents import AutoSubscribe, JobContext, JobProcess, WorkerOptions, cli, llm
 from livekit.agents.pipeline import VoicePipelineAgent
 from livekit.plugins import deepgram, openai, silero, elevenlabs
 from livekit.rtc._proto.room_pb2 import ConnectionState
+from openai import AsyncClient as OpenAIClient
 import logging
 from prompts import CHAT_INSTRUCTIONS, INITIAL_MESSAGE
 from api import ClinicMateFunctions
+from utils import close_email_connections, extract_fields_from_conversation
 import call_processor
+from llm_cache import CachedLLM
 import database 
 from typing import Dict, Any
 
@@ -18,32 +27,138 @@ logger.setLevel(logging.INFO)
 
 load_dotenv()
 
-# Initialize database when the application starts
-database.create_db_and_tables()
-logger.info("Database initialized - tables created")
+# Transcript line templates, bound once so the speech callbacks only pay for the format call
+USER_FMT = "[{ts}] USER:\n{c}\n\n".format
+AGENT_FMT = "[{ts}] AGENT:\n{c}\n\n".format
+FUNCTION_FMT = "[{ts}] FUNCTION CALL: {name}\nRESULT: {c}\n\n".format
+SYSTEM_FMT = "[{ts}] SYSTEM: {c}\n\n".format
+
+# Second-resolution timestamp for transcript lines, reformatted at most once per second
+_last_ts_sec = 0
+_last_ts_str = ""
+
+def now_str() -> str:
+    """Return the current local time as 'YYYY-MM-DD HH:MM:SS', cached per second"""
+    global _last_ts_sec, _last_ts_str
+    t = int(time.time())
+    if t != _last_ts_sec:
+        _last_ts_sec = t
+        _last_ts_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t))
+    return _last_ts_str
+
+# Placeholder text for non-text parts of a multi-part user message; text parts map to themselves
+_PART_REPR = {llm.ChatImage: "[image]"}
+
+# Chat model used by the agent
+LLM_MODEL = "gpt-4o"
+
+# Number of conversation turns kept for extracting patient details at the end of the call
+MAX_HISTORY_TURNS = 200
+
+def write_transcription(filename: str, log_queue: queue.Queue):
+    """Write transcript lines from log_queue to filename until a None sentinel arrives (runs on its own thread)"""
+    with open(filename, "w", buffering=65536) as f:
+        for msg in iter(log_queue.get, None):
+            f.write(msg)
+            # Flush once the backlog is written, so a crash loses at most the lines still queued
+            if log_queue.empty():
+                f.flush()
+
+# Set once the database tables exist in this process
+_db_initialized = threading.Event()
+
+def use_uvloop() -> None:
+    """Make event loops created from now on in this process uvloop loops (not available on Windows)"""
+    if sys.platform != "win32":
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+def prewarm(proc: JobProcess):
+    """Initialize the database, load the VAD model and build the STT/LLM/TTS clients once per worker process"""
+    # Job processes create their event loop after prewarm returns, so the call runs on
+    # uvloop for faster socket/WebSocket dispatch
+    use_uvloop()
+    
+    if not _db_initialized.is_set():
+        database.create_db_and_tables()
+        _db_initialized.set()
+        logger.info("Database initialized - tables created")
+    
+    proc.userdata["vad"] = silero.VAD.load()
+    # Function context for the next call, built ahead of time so the entrypoint can take it as-is
+    proc.userdata["fnc_ctx"] = ClinicMateFunctions()
+    # Streaming recognition tuned for turn latency: partial transcripts, no server-side
+    # buffering and a short endpointing window over 16 kHz mono PCM
+    proc.userdata["stt"] = deepgram.STT(
+        model="nova-2-general",
+        interim_results=True,
+        smart_format=False,
+        no_delay=True,
+        endpointing_ms=150,
+        sample_rate=16000,
+    )
+    # One keep-alive HTTP/2 pool per process so chat completions reuse the TLS connection
+    # across turns and calls (STT/TTS already share livekit's per-process aiohttp session)
+    proc.userdata["http_client"] = httpx.AsyncClient(
+        http2=True,
+        timeout=httpx.Timeout(connect=15.0, read=5.0, write=5.0, pool=5.0),
+        follow_redirects=True,
+        limits=httpx.Limits(max_keepalive_connections=100, keepalive_expiry=300),
+    )
+    proc.userdata["llm"] = openai.LLM(
+        model=LLM_MODEL,
+        client=OpenAIClient(max_retries=0, http_client=proc.userdata["http_client"]),
+    )
+    # Opt-in (dev/testing): run at temperature 0 and replay responses for repeated scripted turns
+    if os.getenv("LLM_RESPONSE_CACHE"):
+        proc.userdata["llm"] = CachedLLM(proc.userdata["llm"], model=LLM_MODEL, temperature=0.0)
+    # Turbo model with an explicit language (skips detection) and the lowest streaming latency
+    proc.userdata["tts"] = elevenlabs.TTS(
+        model="eleven_turbo_v2_5",
+        language="en",
+        streaming_latency=1,
+    )
+    logger.info("Worker process prewarmed - VAD, STT, LLM and TTS ready")
 
 async def entrypoint(ctx: JobContext):
     """Main entry point for the hospital registration agent"""
     
+    # Start connecting to the room right away so the rest of the setup overlaps with it
+    connect_task = asyncio.create_task(ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY))
+    
+    # Load the VAD off the event loop if this process was not prewarmed
+    vad_task = None
+    if "vad" not in ctx.proc.userdata:
+        vad_task = asyncio.create_task(asyncio.to_thread(silero.VAD.load))
+    
     # Create our function context for patient registration
-    fnc_ctx = ClinicMateFunctions()
+    fnc_ctx = ctx.proc.userdata.pop("fnc_ctx", None) or ClinicMateFunctions()
+    # Track recent conversation history to help extract patient information later;
+    # bound once here so the speech callbacks only append to it
+    conversation_history = collections.deque(maxlen=MAX_HISTORY_TURNS)
+    fnc_ctx.conversation_history = conversation_history
     
-    # Initialize chat context with system instructions
+    # Initialize chat context with system instructions. The system prompt and the tool schemas
+    # are static, so every request starts with the same bytes and hits OpenAI's automatic
+    # prefix cache; per-patient state only ever reaches the model through function results
     initial_ctx = llm.ChatContext().append(
         role="system",
         text=CHAT_INSTRUCTIONS
     )
 
-    # Connect to the room and wait for a participant
-    await ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY)
+    # Finish connecting to the room and wait for a participant
+    if vad_task is not None:
+        ctx.proc.userdata["vad"], _ = await asyncio.gather(vad_task, connect_task)
+    else:
+        await connect_task
     participant = await ctx.wait_for_participant()
     
     # Create the voice pipeline agent
     agent = VoicePipelineAgent(
-        vad=silero.VAD.load(),
-        stt=deepgram.STT(),
-        llm=openai.LLM(),
-        tts=elevenlabs.TTS(),
+        vad=ctx.proc.userdata["vad"],
+        stt=ctx.proc.userdata["stt"],
+        llm=ctx.proc.userdata["llm"],
+        tts=ctx.proc.userdata["tts"],
         fnc_ctx=fnc_ctx,
         chat_ctx=initial_ctx,
     )
@@ -52,42 +167,32 @@ async def entrypoint(ctx: JobContext):
     agent.start(ctx.room, participant)
 
     # Set up logging of the conversation
-    log_queue = asyncio.Queue()
+    log_queue = queue.Queue()
     # Flag to track if we've already processed end-of-call actions
     call_end_processed = False
     # Patient ID if we've registered the patient
     patient_id = None
 
-    # Track conversation history to help extract patient information later
-    conversation_history = []
-
     @agent.on("user_speech_committed")
     def on_user_speech_committed(msg: llm.ChatMessage):
         # Log user messages
-        if isinstance(msg.content, list):
-            content = "\n".join(
-                "[image]" if isinstance(x, llm.ChatImage) else x for x in msg
-            )
-        else:
-            content = msg.content
+        content = msg.content
+        if type(content) is list:
+            content = "\n".join(_PART_REPR.get(type(x), x) for x in content)
         
-        log_queue.put_nowait(f"[{datetime.now()}] USER:\n{content}\n\n")
+        log_queue.put_nowait(USER_FMT(ts=now_str(), c=content))
         
         # Add to conversation history
         conversation_history.append({"role": "user", "content": content})
-        # Make conversation history accessible to function context
-        fnc_ctx.conversation_history = conversation_history
 
     @agent.on("agent_speech_committed")
     def on_agent_speech_committed(msg: llm.ChatMessage):
         # Log agent messages
         content = msg.content
-        log_queue.put_nowait(f"[{datetime.now()}] AGENT:\n{content}\n\n")
+        log_queue.put_nowait(AGENT_FMT(ts=now_str(), c=content))
         
         # Add to conversation history
         conversation_history.append({"role": "assistant", "content": content})
-        # Make conversation history accessible to function context
-        fnc_ctx.conversation_history = conversation_history
     
     @agent.on("function_call_succeeded")
     def on_function_call_succeeded(
@@ -102,7 +207,7 @@ async def entrypoint(ctx: JobContext):
         logger.info(f"Function {func_name} succeeded with result: {func_result}")
         
         # Log in a synchronous manner
-        log_queue.put_nowait(f"[{datetime.now()}] FUNCTION CALL: {func_name}\nRESULT: {func_result}\n\n")
+        log_queue.put_nowait(FUNCTION_FMT(ts=now_str(), name=func_name, c=func_result))
         
         # This is the async helper function that will be scheduled as a task
         async def handle_function_success():
@@ -113,12 +218,12 @@ async def entrypoint(ctx: JobContext):
                 if "patient_name" in func_args and func_args["patient_name"]:
                     ctx.patient_name = func_args["patient_name"]
                     logger.info(f"Set patient name from register_patient: {ctx.patient_name}")
-                    log_queue.put_nowait(f"[{datetime.now()}] SYSTEM: Captured patient name: {ctx.patient_name}\n\n")
+                    log_queue.put_nowait(SYSTEM_FMT(ts=now_str(), c=f"Captured patient name: {ctx.patient_name}"))
                 
+                # register_patient has already stored the DOB in canonical YYYY-MM-DD form
                 if func_args.get("date_of_birth"):
-                    ctx.date_of_birth = func_args["date_of_birth"]
                     logger.info(f"Set patient DOB from register_patient: {ctx.date_of_birth}")
-                    log_queue.put_nowait(f"[{datetime.now()}] SYSTEM: Captured DOB: {ctx.date_of_birth}\n\n")
+                    log_queue.put_nowait(SYSTEM_FMT(ts=now_str(), c=f"Captured DOB: {ctx.date_of_birth}"))
             
             # If this is a confirm_information function, check if we have enough patient data
             # before trying to save the patient
@@ -133,26 +238,25 @@ async def entrypoint(ctx: JobContext):
                 if not have_name or not have_dob:
                     logger.warning(f"Missing critical patient data: Name: {have_name}, DOB: {have_dob}")
                     
-                    # Import the extraction function from call_processor
-                    from call_processor import extract_data_from_conversation
+                    # Try to extract the missing fields from conversation in a single pass
+                    missing = tuple(field for field, have in (("name", have_name), ("dob", have_dob)) if not have)
+                    extracted = extract_fields_from_conversation(ctx.conversation_history, missing)
                     
-                    # Try to extract missing name from conversation
-                    if not have_name and hasattr(ctx, 'conversation_history'):
-                        extracted_name = extract_data_from_conversation(ctx.conversation_history, 'name')
+                    if not have_name:
+                        extracted_name = extracted["name"]
                         if extracted_name:
                             ctx.patient_name = extracted_name
                             have_name = True
                             logger.info(f"Extracted patient name from conversation: {extracted_name}")
-                            log_queue.put_nowait(f"[{datetime.now()}] SYSTEM: Extracted name from conversation: {extracted_name}\n\n")
+                            log_queue.put_nowait(SYSTEM_FMT(ts=now_str(), c=f"Extracted name from conversation: {extracted_name}"))
                     
-                    # Try to extract missing DOB from conversation
-                    if not have_dob and hasattr(ctx, 'conversation_history'):
-                        extracted_dob = extract_data_from_conversation(ctx.conversation_history, 'dob')
+                    if not have_dob:
+                        extracted_dob = extracted["dob"]
                         if extracted_dob:
                             ctx.date_of_birth = extracted_dob
                             have_dob = True
                             logger.info(f"Extracted patient DOB from conversation: {extracted_dob}")
-                            log_queue.put_nowait(f"[{datetime.now()}] SYSTEM: Extracted DOB from conversation: {extracted_dob}\n\n")
+                            log_queue.put_nowait(SYSTEM_FMT(ts=now_str(), c=f"Extracted DOB from conversation: {extracted_dob}"))
                 
                 # If we have the minimum required fields, save the patient
                 if have_name and have_dob:
@@ -162,37 +266,37 @@ async def entrypoint(ctx: JobContext):
                             patient_id = new_patient_id
                             ctx.database_patient_id = new_patient_id
                             logger.info(f"Registration completed for patient: {ctx.patient_name} (ID: {patient_id})")
-                            log_queue.put_nowait(f"[{datetime.now()}] SYSTEM: Patient saved to database with ID {patient_id}\n\n")
+                            log_queue.put_nowait(SYSTEM_FMT(ts=now_str(), c=f"Patient saved to database with ID {patient_id}"))
                         else:
                             logger.warning(f"Registration failed for patient: {ctx.patient_name}")
-                            log_queue.put_nowait(f"[{datetime.now()}] SYSTEM: Failed to save patient to database\n\n")
+                            log_queue.put_nowait(SYSTEM_FMT(ts=now_str(), c="Failed to save patient to database"))
                     except Exception as e:
                         logger.error(f"Error saving patient: {str(e)}")
-                        log_queue.put_nowait(f"[{datetime.now()}] SYSTEM: Error saving patient: {str(e)}\n\n")
+                        log_queue.put_nowait(SYSTEM_FMT(ts=now_str(), c=f"Error saving patient: {str(e)}"))
                 else:
                     logger.warning(f"Cannot save patient to database: Missing name ({have_name}) or date of birth ({have_dob})")
-                    log_queue.put_nowait(f"[{datetime.now()}] SYSTEM: Cannot save patient to database: Missing required information\n\n")
+                    log_queue.put_nowait(SYSTEM_FMT(ts=now_str(), c="Cannot save patient to database: Missing required information"))
             
             # If specific information is collected, incrementally update existing patient record
-            if patient_id and func_name in ("collect_insurance_info", "collect_medical_complaint", 
-                                          "collect_address", "collect_phone", "collect_email"):
+            columns = database.PATIENT_UPDATE_COLUMNS.get(func_name)
+            if patient_id and columns:
                 try:
                     # Update the patient record with newly collected information
-                    success = await database.update_patient_from_context(patient_id, ctx, func_name)
+                    success = await database.update_patient_from_context(patient_id, ctx, columns)
                     if success:
                         logger.info(f"Updated patient record with {func_name} information")
-                        log_queue.put_nowait(f"[{datetime.now()}] SYSTEM: Updated patient record with {func_name} information\n\n")
+                        log_queue.put_nowait(SYSTEM_FMT(ts=now_str(), c=f"Updated patient record with {func_name} information"))
                     else:
                         logger.warning(f"Failed to update patient record for {func_name}")
-                        log_queue.put_nowait(f"[{datetime.now()}] SYSTEM: Failed to update patient record with {func_name} information\n\n")
+                        log_queue.put_nowait(SYSTEM_FMT(ts=now_str(), c=f"Failed to update patient record with {func_name} information"))
                 except Exception as e:
                     logger.error(f"Error updating patient record: {str(e)}")
-                    log_queue.put_nowait(f"[{datetime.now()}] SYSTEM: Error updating patient record: {str(e)}\n\n")
+                    log_queue.put_nowait(SYSTEM_FMT(ts=now_str(), c=f"Error updating patient record: {str(e)}"))
             
             # Store the appointment ID if booking was successful
             if func_name == "book_appointment" and ctx.appointment_details and ctx.appointment_id:
                 logger.info(f"Stored appointment ID: {ctx.appointment_id}")
-                log_queue.put_nowait(f"[{datetime.now()}] SYSTEM: Stored appointment ID: {ctx.appointment_id}\n\n")
+                log_queue.put_nowait(SYSTEM_FMT(ts=now_str(), c=f"Stored appointment ID: {ctx.appointment_id}"))
 
         # Create a task to execute the async function
         asyncio.create_task(handle_function_success())
@@ -224,31 +328,36 @@ async def entrypoint(ctx: JobContext):
     async def finish_queue():
         """Final cleanup when the job is shutting down"""
         logger.info("Job shutdown callback triggered - ensuring call end processing")
-        # Ensure end-of-call processing happens
-        await process_end_of_call()
-        
-        # Signal the write task to finish
-        log_queue.put_nowait(None)
-        await write_task
+        try:
+            # Ensure end-of-call processing happens
+            await process_end_of_call()
+            # Let queued confirmation emails and summary writes finish before the process exits,
+            # then log out of the pooled SMTP connections
+            await call_processor.drain_background_tasks()
+            await close_email_connections()
+        finally:
+            # Signal the writer thread to finish and wait for it to flush, even if cleanup failed
+            log_queue.put(None)
+            await asyncio.to_thread(writer.join)
 
     ctx.add_shutdown_callback(finish_queue)
     
-    # Set up file writing for conversation logs
-    async def write_transcription():
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"patient_registration_{timestamp}.log"
-        async with open(filename, "w") as f:
-            while True:
-                msg = await log_queue.get()
-                if msg is None:
-                    break
-                await f.write(msg)
-
-    write_task = asyncio.create_task(write_transcription())
+    # Set up file writing for conversation logs on a dedicated thread
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f"patient_registration_{timestamp}.log"
+    writer = threading.Thread(
+        target=write_transcription,
+        args=(filename, log_queue),
+        name="transcript-writer",
+        daemon=True,
+    )
+    writer.start()
 
     # Start the conversation with the initial greeting
     await agent.say(INITIAL_MESSAGE, allow_interruptions=True)
 
 
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint))
+    # The worker's own connection to the LiveKit server runs on uvloop too
+    use_uvloop()
+    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
@@ -1,12 +1,222 @@
+import dataclasses
+import functools
 import logging
-from datetime import datetime, timedelta
+import re
+from datetime import date, datetime, timedelta
+from enum import IntEnum
+from dateutil import parser as _dateparser
 from livekit.agents import llm
 from typing import Optional, List, Dict, Any
+from utils import parse_date_of_birth
+
+import database
 
 logger = logging.getLogger("hospital-registration")
 logger.setLevel(logging.INFO)
 
-class ClinicMateFunctions(llm.FunctionContext):
+class RegistrationState(IntEnum):
+    """
+    Registration progress
+    
+    The LLM may run collection steps in any order, so the state follows the most
+    recent one, forwards or backwards. Only a completed registration is protected:
+    collection steps never move it back. The patient confirming their details
+    completes the registration; rejecting them returns it to CONTACT until the
+    patient confirms again.
+    """
+    INITIAL = 0
+    BASIC = 1
+    INSURANCE = 2
+    REFERRAL = 3
+    COMPLAINT = 4
+    ADDRESS = 5
+    PHONE = 6
+    CONTACT = 7
+    REGISTERED = 8
+
+# Stage names reported to the call summary and the LLM response cache
+_STAGE_NAMES = {
+    RegistrationState.INITIAL: "initial",
+    RegistrationState.BASIC: "basic_info_collected",
+    RegistrationState.INSURANCE: "insurance_collected",
+    RegistrationState.REFERRAL: "referral_collected",
+    RegistrationState.COMPLAINT: "complaint_collected",
+    RegistrationState.ADDRESS: "address_collected",
+    RegistrationState.PHONE: "phone_collected",
+    RegistrationState.CONTACT: "contact_collected",
+    RegistrationState.REGISTERED: "registration_complete",
+}
+
+def _shared_db_session(fn):
+    """Run a tool with one database session shared by all the queries it makes"""
+    @functools.wraps(fn)
+    async def wrapper(self, **kwargs):
+        async with database.shared_session():
+            return await fn(self, **kwargs)
+    return wrapper
+
+# Words the fuzzy parser skips but that change the meaning of a spoken date
+_RELATIVE_DATE_WORDS = frozenset({
+    "next", "last", "this", "coming", "following", "today", "tonight", "tomorrow", "yesterday",
+    "day", "days", "week", "weeks", "month", "months",
+})
+_WORDS = re.compile(r"[a-z]+")
+# A whole month name or abbreviation, or a numeric date; without one the parser fills the
+# month in from today. "May" only counts before a day number, so "May I..." is not a date.
+_EXPLICIT_DATE = re.compile(
+    r"\b(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may(?=\s*\d)|june?|july?|aug(?:ust)?"
+    r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\b\.?|\d{1,4}[/-]\d{1,2}",
+    re.IGNORECASE,
+)
+
+@functools.lru_cache(maxsize=256)
+def _parse_appointment_date(date_time_str: str, today: date) -> Optional[datetime]:
+    """
+    Parse a requested appointment time
+    
+    Args:
+        date_time_str: The time as given, in ISO form or spoken ("Monday, January 1 at 9:00 AM")
+        today: The date that fills in missing parts and the earliest date accepted;
+            part of the cache key so results do not carry over to the next day
+        
+    Returns:
+        The parsed datetime, or None if the string could not be parsed reliably
+    """
+    # ISO strings (2023-01-01 09:00, 2023-01-01T09:00) take the C fast path
+    try:
+        parsed = datetime.fromisoformat(date_time_str)
+    except ValueError:
+        parsed = None
+    
+    if parsed is None:
+        # Relative phrases ("next Tuesday", "tomorrow") and bare numbers would be
+        # silently misread by the fuzzy parser, so leave those to the scheduling team
+        if not _EXPLICIT_DATE.search(date_time_str):
+            logger.warning("No explicit date in appointment request: %s", date_time_str)
+            return None
+        
+        # Missing parts default to today at 9:00 AM
+        default = datetime.combine(today, datetime.min.time()).replace(hour=9)
+        try:
+            parsed, skipped = _dateparser.parse(date_time_str, fuzzy_with_tokens=True, default=default)
+        except (ValueError, OverflowError) as e:
+            logger.error("Error parsing appointment date: %s", e)
+            return None
+        
+        if any(word in _RELATIVE_DATE_WORDS for token in skipped for word in _WORDS.findall(token.lower())):
+            logger.warning("Relative appointment date not parsed: %s", date_time_str)
+            return None
+    
+    if parsed.date() < today:
+        logger.warning("Appointment date %s is in the past: %s", parsed, date_time_str)
+        return None
+    return parsed
+
+_NON_DIGITS = re.compile(r"\D+")
+
+def _canonical_dob(date_of_birth: str) -> str:
+    """Store a date of birth as YYYY-MM-DD when it parses, otherwise as given"""
+    dob = parse_date_of_birth(date_of_birth.strip())
+    return dob.isoformat() if dob else date_of_birth
+
+def _canonical_phone(phone_number: str) -> str:
+    """Store US numbers as (XXX) XXX-XXXX, anything else as given"""
+    digits = _NON_DIGITS.sub("", phone_number)
+    if len(digits) == 11 and digits[0] == "1":
+        digits = digits[1:]
+    if len(digits) == 10:
+        return f"({digits[:3]}) {digits[3:6]}-{digits[6:]}"
+    return phone_number.strip()
+
+def _canonical_email(email: str) -> str:
+    return email.strip().lower()
+
+# Normalizers applied when a field is collected or updated, so summaries only format stored values
+_NORMALIZERS = {
+    "date_of_birth": _canonical_dob,
+    "phone_number": _canonical_phone,
+    "email": _canonical_email,
+}
+
+# Referral values that mean the patient has no referral
+_NEGATIVE_ANSWERS = frozenset({"no", "n", "none", "false", ""})
+
+# update_specific_info field names (lowercased) -> (attribute, log label, reply template)
+_FIELD_MAP = {
+    "name": ("patient_name", "patient name", "I've updated your name to {}."),
+    "date of birth": ("date_of_birth", "DOB", "I've updated your date of birth to {}."),
+    "dob": ("date_of_birth", "DOB", "I've updated your date of birth to {}."),
+    "insurance provider": ("insurance_provider", "insurance provider", "I've updated your insurance provider to {}."),
+    "provider": ("insurance_provider", "insurance provider", "I've updated your insurance provider to {}."),
+    "insurance id": ("insurance_id", "insurance ID", "I've updated your insurance ID to {}."),
+    "id": ("insurance_id", "insurance ID", "I've updated your insurance ID to {}."),
+    "referral": ("referred_physician", "referred physician", "I've updated your referral to {}."),
+    "referred physician": ("referred_physician", "referred physician", "I've updated your referral to {}."),
+    "complaint": ("medical_complaint", "medical complaint", "I've updated your reason for visit to: {}."),
+    "reason": ("medical_complaint", "medical complaint", "I've updated your reason for visit to: {}."),
+    "medical complaint": ("medical_complaint", "medical complaint", "I've updated your reason for visit to: {}."),
+    "address": ("address", "address", "I've updated your address to: {}."),
+    "phone": ("phone_number", "phone number", "I've updated your phone number to {}."),
+    "phone number": ("phone_number", "phone number", "I've updated your phone number to {}."),
+    "email": ("email", "email", "I've updated your email to {}."),
+}
+
+# Reply templates for the collect_* functions, built once at import
+_INSURANCE_REPLY = "I've recorded your insurance information with {provider}, ID: {insurance_id}. Do you have a referral to a specific physician for this visit?".format
+_REFERRAL_TO_REPLY = "I've noted that you were referred to {}. Could you please tell me the reason for your visit today or your chief medical complaint?".format
+_EMAIL_REPLY = "Thank you. I've recorded your email as {}.".format
+_SUMMARY_INTRO = " Here's a summary of all the information you've provided:\n\n"
+
+# book_appointment replies
+_APPT_BOOKED_REPLY = "Great news! I've successfully booked your appointment with {doctor}, our {specialty} specialist, for {date}. The appointment will last approximately 30 minutes. Please arrive 15 minutes early with your insurance card and ID. Would you like me to send a confirmation to your email or phone?".format
+_APPT_PENDING_REPLY = "I've scheduled your appointment with {doctor} for {date}. There was a small issue with our system, but your appointment request has been recorded. Our scheduling team will contact you to confirm. Would you like me to send a confirmation to your email or phone?".format
+
+# How appointment times are read back to the patient
+_SLOT_FMT = "%A, %B %d, %Y at %I:%M %p"
+
+# Fixed replies
+_MSG_REFERRAL_NO_PHYSICIAN = "I've noted that you have a referral. Could you please tell me the name of the physician you were referred to?"
+_MSG_NO_REFERRAL = "I've noted that you don't have a referral. Could you please tell me the reason for your visit today or your chief medical complaint?"
+_MSG_ASK_ADDRESS = "Thank you for sharing that information. I've noted your concern. Now, I need to collect your address. Could you please provide your full address including street, city, state, and zip code?"
+_MSG_ASK_PHONE = "Thank you. Now, could you please provide your phone number where we can reach you?"
+_MSG_ASK_EMAIL = "Thank you. Would you like to provide an email address? This is optional but will allow us to send you appointment reminders and other information."
+_MSG_NO_EMAIL_OK = "That's fine. You've chosen not to provide an email address."
+_MSG_NO_PATIENT_INFO = "No patient information available yet."
+_MSG_REGISTRATION_CONFIRMED = "Thank you for confirming. All your information has been successfully registered in our system. Would you like to schedule an appointment with one of our specialists based on your medical needs?"
+_MSG_ASK_CORRECTION = "I understand there might be some corrections needed. Please let me know which information you'd like to correct."
+_MSG_REFERRAL_CLEARED = "I've updated your information to indicate you don't have a referral."
+_MSG_DECLINED_APPT = "That's fine. Your registration is complete, and you can always call back later to schedule an appointment. Is there anything else I can help you with today?"
+_MSG_NEED_DOCTOR_NAME = "I need a doctor name to proceed. Could you please specify which doctor you'd like to see?"
+_MSG_NEED_DOCTOR = "I need to know which doctor you'd like to see before I can book an appointment. Could you please tell me which doctor you prefer?"
+_MSG_SLOT_UNAVAILABLE = "I'm sorry, but that time slot is no longer available. Would you like to choose a different time?"
+_MSG_BOOKING_CANCELED = "I've canceled the appointment booking process. You can always call back later to schedule an appointment. Is there anything else I can help you with today?"
+_MSG_NO_APPOINTMENT = "There's no appointment to send confirmation for. Would you like to schedule an appointment?"
+_MSG_NO_CONFIRMATION_CHANNEL = "I couldn't send a confirmation because no email or phone number was provided. Your appointment is still confirmed in our system. Is there anything else I can help you with today?"
+
+# Appointment section of the patient summary
+_APPOINTMENT_INFO = "\nAppointment Details:\nDoctor: {name}\nSpecialty: {specialty}\nDate/Time: {date_time}\nDuration: {duration} minutes\n".format
+
+class _PrebuiltFunctionContext(llm.FunctionContext):
+    """FunctionContext that discovers its ai_callable methods once, when a subclass is defined"""
+    
+    # FunctionInfo for each ai_callable, built by FunctionContext's introspection on a probe instance
+    _cached_fncs: Dict[str, llm.FunctionInfo] = {}
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        probe = cls.__new__(cls)
+        llm.FunctionContext.__init__(probe)
+        cls._cached_fncs = probe._fncs
+    
+    def __init__(self):
+        # Rebind the cached function infos to this instance instead of re-running the
+        # signature/type-hint introspection in FunctionContext.__init__ for every call
+        self._fncs = {
+            name: dataclasses.replace(info, callable=getattr(self, info.callable.__name__))
+            for name, info in self._cached_fncs.items()
+        }
+
+class ClinicMateFunctions(_PrebuiltFunctionContext):
     """Functions for patient registration"""
     
     def __init__(self):
@@ -21,9 +231,7 @@ class ClinicMateFunctions(llm.FunctionContext):
         self.has_referral = False
         self.referred_physician = None
         self.medical_complaint = None
-        self.registration_stage = "initial"  # Track the conversation stage
-        self.is_confirmed = False
-        self.is_registered = False
+        self.state = RegistrationState.INITIAL  # Track the conversation stage
         
         # New fields for appointment booking
         self.wants_appointment = False
@@ -35,16 +243,49 @@ class ClinicMateFunctions(llm.FunctionContext):
         
         # Track database ID to prevent duplicate saves
         self.database_patient_id = None
+        
+        # Conversation turns, used to recover details the LLM did not pass to a function
+        self.conversation_history = []
+    
+    @property
+    def registration_stage(self) -> str:
+        return _STAGE_NAMES[self.state]
+    
+    @property
+    def is_confirmed(self) -> bool:
+        # Confirming the collected details is what completes the registration
+        return self.state >= RegistrationState.REGISTERED
+    
+    @property
+    def is_registered(self) -> bool:
+        return self.state >= RegistrationState.REGISTERED
+    
+    def _advance_stage(self, new_state: RegistrationState, **collected: Any) -> None:
+        """Move to new_state and log the transition once, with the fields collected for it"""
+        # The LLM may collect fields in any order, but a completed registration is only
+        # reopened by a rejected confirmation; later corrections just update the fields
+        if self.state >= RegistrationState.REGISTERED and new_state < self.state:
+            return
+        self._set_state(new_state, collected)
+    
+    def _set_state(self, new_state: RegistrationState, collected: Dict[str, Any]) -> None:
+        """Switch to new_state unconditionally, logging the transition if it changes anything"""
+        old_state = self.state
+        if new_state == old_state:
+            return
+        self.state = new_state
+        old_stage, new_stage = _STAGE_NAMES[old_state], _STAGE_NAMES[new_state]
+        logger.info(
+            "Stage %s -> %s: %s", old_stage, new_stage, collected,
+            extra={"from_stage": old_stage, "to_stage": new_stage, "fields": collected},
+        )
     
     @llm.ai_callable()
     async def register_patient(self, name: str, date_of_birth: str) -> str:
         """Register a patient in the system with their name and date of birth"""
         self.patient_name = name
-        self.date_of_birth = date_of_birth
-        self.registration_stage = "basic_info_collected"
-        
-        # In a real system, this would save to a database
-        logger.info(f"Collected basic patient info: {name}, DOB: {date_of_birth}")
+        self.date_of_birth = _canonical_dob(date_of_birth)
+        self._advance_stage(RegistrationState.BASIC, name=name, date_of_birth=self.date_of_birth)
         
         return f"Thank you, {name}. I've recorded your date of birth as {date_of_birth}. Now, let's get your insurance information. Could you please tell me the name of your insurance provider?"
     
@@ -53,194 +294,148 @@ class ClinicMateFunctions(llm.FunctionContext):
         """Collect the patient's insurance information"""
         self.insurance_provider = provider
         self.insurance_id = insurance_id
-        self.registration_stage = "insurance_collected"
-        
-        logger.info(f"Collected insurance info: Provider: {provider}, ID: {insurance_id}")
+        self._advance_stage(RegistrationState.INSURANCE, provider=provider, insurance_id=insurance_id)
         
-        return f"I've recorded your insurance information with {provider}, ID: {insurance_id}. Do you have a referral to a specific physician for this visit?"
+        return _INSURANCE_REPLY(provider=provider, insurance_id=insurance_id)
     
     @llm.ai_callable()
     async def collect_referral_info(self, has_referral: bool, referred_physician: Optional[str] = None) -> str:
         """Collect information about whether the patient has a referral"""
         self.has_referral = has_referral
         self.referred_physician = referred_physician
-        self.registration_stage = "referral_collected"
+        self._advance_stage(RegistrationState.REFERRAL, has_referral=has_referral, referred_physician=referred_physician)
         
         if has_referral and referred_physician:
-            logger.info(f"Patient has referral to: {referred_physician}")
-            return f"I've noted that you were referred to {referred_physician}. Could you please tell me the reason for your visit today or your chief medical complaint?"
+            return _REFERRAL_TO_REPLY(referred_physician)
         elif has_referral:
-            logger.info("Patient has referral but did not specify physician")
-            return "I've noted that you have a referral. Could you please tell me the name of the physician you were referred to?"
+            return _MSG_REFERRAL_NO_PHYSICIAN
         else:
-            logger.info("Patient does not have a referral")
-            return "I've noted that you don't have a referral. Could you please tell me the reason for your visit today or your chief medical complaint?"
+            return _MSG_NO_REFERRAL
     
     @llm.ai_callable()
     async def collect_medical_complaint(self, complaint: str) -> str:
         """Collect the patient's chief medical complaint"""
         self.medical_complaint = complaint
-        self.registration_stage = "complaint_collected"
+        self._advance_stage(RegistrationState.COMPLAINT, complaint=complaint)
         
-        logger.info(f"Collected medical complaint: {complaint}")
-        
-        return f"Thank you for sharing that information. I've noted your concern. Now, I need to collect your address. Could you please provide your full address including street, city, state, and zip code?"
+        return _MSG_ASK_ADDRESS
     
     @llm.ai_callable()
     async def collect_address(self, address: str) -> str:
         """Collect the patient's address"""
         self.address = address
-        self.registration_stage = "address_collected"
-        
-        logger.info(f"Collected address: {address}")
+        self._advance_stage(RegistrationState.ADDRESS, address=address)
         
-        return "Thank you. Now, could you please provide your phone number where we can reach you?"
+        return _MSG_ASK_PHONE
     
     @llm.ai_callable()
     async def collect_phone(self, phone_number: str) -> str:
         """Collect the patient's phone number"""
-        self.phone_number = phone_number
-        self.registration_stage = "phone_collected"
-        
-        logger.info(f"Collected phone number: {phone_number}")
+        self.phone_number = _canonical_phone(phone_number)
+        self._advance_stage(RegistrationState.PHONE, phone_number=self.phone_number)
         
-        return "Thank you. Would you like to provide an email address? This is optional but will allow us to send you appointment reminders and other information."
+        return _MSG_ASK_EMAIL
     
     @llm.ai_callable()
     async def collect_email(self, email: Optional[str] = None) -> str:
         """Collect the patient's email address (optional)"""
+        if email:
+            email = _canonical_email(email)
         self.email = email
-        self.registration_stage = "contact_collected"
+        self._advance_stage(RegistrationState.CONTACT, email=email)
         
         if email:
-            logger.info(f"Collected email: {email}")
-            message = f"Thank you. I've recorded your email as {email}."
+            message = _EMAIL_REPLY(email)
         else:
-            logger.info("Patient declined to provide email")
-            message = "That's fine. You've chosen not to provide an email address."
+            message = _MSG_NO_EMAIL_OK
         
-        return message + " Here's a summary of all the information you've provided:\n\n" + await self.get_patient_info()
+        return message + _SUMMARY_INTRO + self._format_patient_info()
     
     @llm.ai_callable()
     async def get_patient_info(self) -> str:
         """Get a summary of all collected patient information"""
+        return self._format_patient_info()
+    
+    def _format_patient_info(self) -> str:
+        """Format the collected patient information; internal callers use this directly"""
         if not self.patient_name:
-            return "No patient information available yet."
+            return _MSG_NO_PATIENT_INFO
         
-        info = f"Name: {self.patient_name}\n"
+        parts = [f"Name: {self.patient_name}\n"]
         if self.date_of_birth:
-            info += f"Date of Birth: {self.date_of_birth}\n"
+            parts.append(f"Date of Birth: {self.date_of_birth}\n")
         
         if self.insurance_provider:
-            info += f"Insurance Provider: {self.insurance_provider}\n"
+            parts.append(f"Insurance Provider: {self.insurance_provider}\n")
         if self.insurance_id:
-            info += f"Insurance ID: {self.insurance_id}\n"
+            parts.append(f"Insurance ID: {self.insurance_id}\n")
         
         if self.has_referral and self.referred_physician:
-            info += f"Referral: Yes, to {self.referred_physician}\n"
+            parts.append(f"Referral: Yes, to {self.referred_physician}\n")
         elif self.has_referral:
-            info += "Referral: Yes\n"
+            parts.append("Referral: Yes\n")
         elif self.has_referral is False:
-            info += "Referral: No\n"
+            parts.append("Referral: No\n")
         
         if self.medical_complaint:
-            info += f"Reason for Visit: {self.medical_complaint}\n"
+            parts.append(f"Reason for Visit: {self.medical_complaint}\n")
         
         if self.address:
-            info += f"Address: {self.address}\n"
+            parts.append(f"Address: {self.address}\n")
         if self.phone_number:
-            info += f"Phone: {self.phone_number}\n"
+            parts.append(f"Phone: {self.phone_number}\n")
         if self.email:
-            info += f"Email: {self.email}\n"
+            parts.append(f"Email: {self.email}\n")
         
         # Add appointment information if available
         if self.appointment_details:
-            info += "\nAppointment Details:\n"
-            info += f"Doctor: {self.appointment_details.get('doctor', {}).get('name', 'Unknown')}\n"
-            info += f"Specialty: {self.appointment_details.get('doctor', {}).get('specialty', 'Unknown')}\n"
-            info += f"Date/Time: {self.appointment_details.get('date_time', 'Unknown')}\n"
-            info += f"Duration: {self.appointment_details.get('duration_minutes', '30')} minutes\n"
-        
-        if self.is_registered:
-            info += "\n(Registration complete)"
-        
-        return info
+            doctor = self.appointment_details.get('doctor', {})
+            parts.append(_APPOINTMENT_INFO(
+                name=doctor.get('name', 'Unknown'),
+                specialty=doctor.get('specialty', 'Unknown'),
+                date_time=self.appointment_details.get('date_time', 'Unknown'),
+                duration=self.appointment_details.get('duration_minutes', '30'),
+            ))
+        
+        if self.state >= RegistrationState.REGISTERED:
+            parts.append("\n(Registration complete)")
+        
+        return "".join(parts)
     
     @llm.ai_callable()
     async def confirm_information(self, confirmed: bool) -> str:
         """Confirm all the collected patient information"""
         if confirmed:
-            self.is_confirmed = True
-            self.is_registered = True
-            self.registration_stage = "registration_complete"
+            self._advance_stage(RegistrationState.REGISTERED, patient_name=self.patient_name)
             
-            logger.info(f"Registration completed for patient: {self.patient_name}")
-            
-            return "Thank you for confirming. All your information has been successfully registered in our system. Would you like to schedule an appointment with one of our specialists based on your medical needs?"
+            return _MSG_REGISTRATION_CONFIRMED
         else:
-            self.is_confirmed = False
-            return "I understand there might be some corrections needed. Please let me know which information you'd like to correct."
+            # Wait for corrections and a new confirmation; earlier collection steps are kept
+            self._set_state(min(self.state, RegistrationState.CONTACT), {"confirmed": False})
+            return _MSG_ASK_CORRECTION
     
     @llm.ai_callable()
     async def update_specific_info(self, field: str, value: str) -> str:
         """Update a specific field of patient information"""
         field = field.lower()
+        entry = _FIELD_MAP.get(field)
+        if entry is None:
+            logger.warning("Attempted to update unknown field: %s", field)
+            return f"I'm sorry, I don't recognize '{field}' as a valid field. Please specify which information you'd like to update."
         
-        if field == "name":
-            self.patient_name = value
-            logger.info(f"Updated patient name to: {value}")
-            return f"I've updated your name to {value}."
-        
-        elif field == "date of birth" or field == "dob":
-            self.date_of_birth = value
-            logger.info(f"Updated DOB to: {value}")
-            return f"I've updated your date of birth to {value}."
-        
-        elif field == "insurance provider" or field == "provider":
-            self.insurance_provider = value
-            logger.info(f"Updated insurance provider to: {value}")
-            return f"I've updated your insurance provider to {value}."
-        
-        elif field == "insurance id" or field == "id":
-            self.insurance_id = value
-            logger.info(f"Updated insurance ID to: {value}")
-            return f"I've updated your insurance ID to {value}."
-        
-        elif field == "referral" or field == "referred physician":
-            if value.lower() in ("no", "none", "false"):
+        attr, label, reply = entry
+        if attr == "referred_physician":
+            if value.lower() in _NEGATIVE_ANSWERS:
                 self.has_referral = False
                 self.referred_physician = None
                 logger.info("Updated: Patient has no referral")
-                return "I've updated your information to indicate you don't have a referral."
-            else:
-                self.has_referral = True
-                self.referred_physician = value
-                logger.info(f"Updated referred physician to: {value}")
-                return f"I've updated your referral to {value}."
-        
-        elif field == "complaint" or field == "reason" or field == "medical complaint":
-            self.medical_complaint = value
-            logger.info(f"Updated medical complaint to: {value}")
-            return f"I've updated your reason for visit to: {value}."
-        
-        elif field == "address":
-            self.address = value
-            logger.info(f"Updated address to: {value}")
-            return f"I've updated your address to: {value}."
-        
-        elif field == "phone" or field == "phone number":
-            self.phone_number = value
-            logger.info(f"Updated phone number to: {value}")
-            return f"I've updated your phone number to {value}."
-        
-        elif field == "email":
-            self.email = value
-            logger.info(f"Updated email to: {value}")
-            return f"I've updated your email to {value}."
+                return _MSG_REFERRAL_CLEARED
+            self.has_referral = True
         
-        else:
-            logger.warning(f"Attempted to update unknown field: {field}")
-            return f"I'm sorry, I don't recognize '{field}' as a valid field. Please specify which information you'd like to update."
+        normalize = _NORMALIZERS.get(attr)
+        setattr(self, attr, normalize(value) if normalize else value)
+        logger.info("Updated %s to: %s", label, value)
+        return reply.format(value)
     
     # New functions for appointment booking
     
@@ -257,65 +452,58 @@ class ClinicMateFunctions(llm.FunctionContext):
             self.specialty_preference = ""
         
         if wants_appointment:
-            # Import here to avoid circular imports
-            import database
-            
             # Get available specialties
-            specialties = await database.get_all_specialties()
-            specialty_options = ", ".join([s.name for s in specialties])
+            specialty_options = await database.get_specialty_options()
             
             logger.info("Patient wants to schedule an appointment")
             return f"Great! Based on your medical complaint, I can help you schedule an appointment with one of our specialists. We have specialists in the following areas: {specialty_options}. Which specialty would be most appropriate for your needs?"
         else:
             logger.info("Patient does not want to schedule an appointment")
-            return "That's fine. Your registration is complete, and you can always call back later to schedule an appointment. Is there anything else I can help you with today?"
+            return _MSG_DECLINED_APPT
     
     @llm.ai_callable()
+    @_shared_db_session
     async def select_specialty(self, specialty: str) -> str:
         """Select a medical specialty for the appointment"""
         self.specialty_preference = specialty
         
-        # Import here to avoid circular imports
-        import database
-        
         # Find the specialty using the new helper function for better matching
-        specialty_obj = await database.find_specialty_by_name(specialty)
+        specialty_obj = await database.find_specialty_cached(specialty)
         
         if not specialty_obj:
-            logger.warning(f"Specialty not found: {specialty}")
-            return f"I'm sorry, I couldn't find '{specialty}' in our system. Please choose from one of our available specialties: Cardiology, Ophthalmology, Otolaryngology (ENT), Orthopedics, Neurology, Dermatology, Pulmonology, or Gastroenterology."
+            logger.warning("Specialty not found: %s", specialty)
+            specialty_options = await database.get_specialty_options()
+            return f"I'm sorry, I couldn't find '{specialty}' in our system. Please choose from one of our available specialties: {specialty_options}."
         
         # Get doctors in this specialty
         doctors = await database.get_doctors_by_specialty(specialty_obj.id)
         
         if not doctors:
-            logger.warning(f"No doctors found for specialty: {specialty}")
+            logger.warning("No doctors found for specialty: %s", specialty)
             return f"I'm sorry, we don't have any doctors available for {specialty} at the moment. Would you like to choose a different specialty?"
         
         # Format the doctors list
         doctor_list = "\n".join([f"- {d.name}: {d.bio}" for d in doctors])
         
-        logger.info(f"Patient selected specialty: {specialty}")
+        logger.info("Patient selected specialty: %s", specialty)
         return f"We have the following doctors available in {specialty_obj.name}:\n\n{doctor_list}\n\nWhich doctor would you prefer to see?"
     
     @llm.ai_callable()
+    @_shared_db_session
     async def select_doctor(self, doctor_name: str) -> str:
         """Select a doctor for the appointment"""
         # Check if doctor_name is None or empty
         if not doctor_name or doctor_name.strip() == "":
             logger.warning("Doctor name is empty in select_doctor call")
-            return "I need a doctor name to proceed. Could you please specify which doctor you'd like to see?"
+            return _MSG_NEED_DOCTOR_NAME
             
         self.doctor_preference = doctor_name
         
-        # Import here to avoid circular imports
-        import database
-        
         # Use the new helper function for flexible doctor name matching
-        doctor = await database.find_doctor_by_name(doctor_name)
+        doctor = await database.find_doctor_cached(doctor_name)
         
         if not doctor:
-            logger.warning(f"Doctor not found: {doctor_name}")
+            logger.warning("Doctor not found: %s", doctor_name)
             return f"I'm sorry, I couldn't find '{doctor_name}' in our system. Please choose from one of our available doctors."
         
         doctor_id = doctor.id
@@ -325,21 +513,51 @@ class ClinicMateFunctions(llm.FunctionContext):
         available_slots = await database.get_next_available_slots(doctor_id, next_week)
         
         if not available_slots:
-            logger.warning(f"No available slots for doctor: {doctor_name}")
+            logger.warning("No available slots for doctor: %s", doctor_name)
             return f"I'm sorry, {doctor_name} doesn't have any available appointments in the next two weeks. Would you like to choose a different doctor?"
         
         # Format the available slots
-        slot_list = "\n".join([f"- {slot.strftime('%A, %B %d, %Y at %I:%M %p')}" for slot in available_slots])
+        slot_list = "\n".join(f"- {slot.strftime(_SLOT_FMT)}" for slot in available_slots)
         
-        logger.info(f"Patient selected doctor: {doctor_name} (ID: {doctor_id})")
+        logger.info("Patient selected doctor: %s (ID: %s)", doctor_name, doctor_id)
         return f"{doctor.name} has the following available appointment slots:\n\n{slot_list}\n\nWhich date and time would you prefer?"
     
+    def _make_fallback_details(
+        self,
+        date_time: str,
+        error: str,
+        doctor_name: Optional[str] = None,
+        doctor_specialty: Optional[str] = None,
+        status: str = 'pending',
+    ) -> Dict[str, Any]:
+        """
+        Build the appointment details recorded when booking could not complete
+        
+        Args:
+            date_time: The requested or formatted appointment time
+            error: Why the booking did not complete
+            doctor_name: The resolved doctor name, defaulting to the patient's preference
+            doctor_specialty: The resolved specialty, defaulting to the patient's preference
+            status: The appointment status to record
+            
+        Returns:
+            Appointment details for the summary and confirmation
+        """
+        return {
+            'doctor': {
+                'name': doctor_name or self.doctor_preference or 'Unknown Doctor',
+                'specialty': doctor_specialty or self.specialty_preference or 'Unknown Specialty',
+            },
+            'date_time': date_time,
+            'duration_minutes': 30,
+            'status': status,
+            'error': error
+        }
+    
     @llm.ai_callable()
+    @_shared_db_session
     async def book_appointment(self, date_time_str: str) -> str:
         """Book an appointment at the specified date and time"""
-        # Import here to avoid circular imports
-        import database
-        
         # Initialize variables to track success state
         doctor_found = False
         date_parsed = False
@@ -348,85 +566,41 @@ class ClinicMateFunctions(llm.FunctionContext):
         
         # Check if doctor_preference is None and handle it
         if self.doctor_preference is None:
-            logger.error(f"doctor_preference is None, cannot book appointment")
-            self.appointment_details = {
-                'doctor': {'name': 'Unknown Doctor', 'specialty': self.specialty_preference or 'Unknown Specialty'},
-                'date_time': date_time_str,
-                'status': 'pending',
-                'error': "Doctor not specified"
-            }
-            return "I need to know which doctor you'd like to see before I can book an appointment. Could you please tell me which doctor you prefer?" 
+            logger.error("doctor_preference is None, cannot book appointment")
+            self.appointment_details = self._make_fallback_details(date_time_str, "Doctor not specified")
+            return _MSG_NEED_DOCTOR
         
         # Find the doctor using our new helper function
         doctor = None
         doctor_id = None
         try:
-            doctor = await database.find_doctor_by_name(self.doctor_preference)
+            # Usually a cache hit: select_doctor just resolved the same name
+            doctor = await database.find_doctor_cached(self.doctor_preference)
             if doctor:
                 doctor_id = doctor.id
                 doctor_found = True
-                logger.info(f"Found doctor: {doctor.name} (ID: {doctor_id})")
+                logger.info("Found doctor: %s (ID: %s)", doctor.name, doctor_id)
         except Exception as e:
-            logger.error(f"Error finding doctor: {str(e)}")
+            logger.error("Error finding doctor: %s", e)
         
         if not doctor_found:
-            logger.warning(f"Doctor not found when booking: {self.doctor_preference}")
-            # Create appointment_details with minimal information for fallback
-            self.appointment_details = {
-                'doctor': {'name': self.doctor_preference or 'Unknown Doctor', 'specialty': self.specialty_preference or 'Unknown Specialty'},
-                'date_time': date_time_str,
-                'status': 'pending',
-                'error': "Doctor not found"
-            }
+            logger.warning("Doctor not found when booking: %s", self.doctor_preference)
+            self.appointment_details = self._make_fallback_details(date_time_str, "Doctor not found")
             # Safe string concatenation handling None values
             doctor_name = self.doctor_preference if self.doctor_preference is not None else "the requested doctor"
             return f"I've noted your request to schedule with {doctor_name}. There seems to be an issue with our system, but our scheduling team will contact you within 24 hours to confirm your appointment."
         
-        # Parse the date_time string
-        appointment_date = None
-        try:
-            # Try different formats
-            for fmt in [
-                "%A, %B %d, %Y at %I:%M %p",  # Monday, January 1, 2023 at 9:00 AM
-                "%B %d, %Y at %I:%M %p",      # January 1, 2023 at 9:00 AM
-                "%Y-%m-%d %H:%M",             # 2023-01-01 09:00
-                "%m/%d/%Y %H:%M",             # 01/01/2023 09:00
-                "%m/%d/%Y %I:%M %p",          # 01/01/2023 9:00 AM
-                "%A, %B %d, %Y"               # Monday, January 1, 2023 (defaults to 9:00 AM)
-            ]:
-                try:
-                    appointment_date = datetime.strptime(date_time_str, fmt)
-                    date_parsed = True
-                    break
-                except ValueError:
-                    continue
-                
-            # If none of the formats match, try a simple approach for "April 1" type strings
-            if not date_parsed and "april" in date_time_str.lower():
-                try:
-                    # Extract day from the string
-                    day_parts = [p for p in date_time_str.lower().replace(",", "").split() if p.isdigit()]
-                    if day_parts:
-                        day = int(day_parts[0])
-                        # Default to 9:00 AM
-                        appointment_date = datetime(2025, 4, day, 9, 0)
-                        date_parsed = True
-                except Exception:
-                    pass
-        except Exception as e:
-            logger.error(f"Error parsing appointment date: {str(e)}")
+        # Parse the date_time string; the patient usually repeats an offered slot
+        appointment_date = _parse_appointment_date(date_time_str, date.today())
+        date_parsed = appointment_date is not None
         
         if not date_parsed:
-            # Create appointment_details with minimal information for fallback
-            doctor_name = doctor.name if doctor else self.doctor_preference
-            doctor_specialty = doctor.specialty.name if doctor and doctor.specialty else self.specialty_preference
-            
-            self.appointment_details = {
-                'doctor': {'name': doctor_name, 'specialty': doctor_specialty},
-                'date_time': date_time_str,
-                'status': 'pending',
-                'error': f"Could not parse date: {date_time_str}"
-            }
+            self.appointment_details = self._make_fallback_details(
+                date_time_str,
+                f"Could not parse date: {date_time_str}",
+                doctor.name,
+                doctor.specialty.name if doctor.specialty else None,
+            )
             return f"I've noted your preference for an appointment on {date_time_str}. Our scheduling team will contact you to confirm the exact date and time. Would you like me to send a confirmation to your email or phone?"
         
         # Store for later use
@@ -434,38 +608,32 @@ class ClinicMateFunctions(llm.FunctionContext):
         
         # Check if patient is in database and has ID
         patient_id = None
-        if getattr(self, "database_patient_id", None):
+        if self.database_patient_id is not None:
             patient_id = self.database_patient_id
             patient_created = True
         else:
             # Create a patient in the database if one doesn't exist yet
             try:
-                from database import save_patient_from_context
-                patient_id = await save_patient_from_context(self)
+                patient_id = await database.save_patient_from_context(self)
                 if patient_id:
                     self.database_patient_id = patient_id
                     patient_created = True
-                    logger.info(f"Created patient with ID {patient_id} for appointment booking")
+                    logger.info("Created patient with ID %s for appointment booking", patient_id)
                 else:
                     logger.error("Failed to create patient for appointment booking")
             except Exception as e:
-                logger.error(f"Error creating patient for appointment: {str(e)}")
+                logger.error("Error creating patient for appointment: %s", e)
         
         # Always create appointment details, even if the database operation fails
         doctor_name = doctor.name if doctor else self.doctor_preference
         doctor_specialty = doctor.specialty.name if doctor and doctor.specialty else self.specialty_preference
-        formatted_date = appointment_date.strftime("%A, %B %d, %Y at %I:%M %p") if appointment_date else date_time_str
+        formatted_date = appointment_date.strftime(_SLOT_FMT) if appointment_date else date_time_str
         
         if not patient_created:
-            # Create appointment_details with minimal information for fallback
-            self.appointment_details = {
-                'doctor': {'name': doctor_name, 'specialty': doctor_specialty},
-                'date_time': formatted_date,
-                'duration_minutes': 30,
-                'status': 'pending',
-                'error': "Failed to create patient"
-            }
-            return f"I've scheduled your appointment with {doctor_name} for {formatted_date}. There was a small issue with our system, but your appointment request has been recorded. Our scheduling team will contact you to confirm. Would you like me to send a confirmation to your email or phone?"
+            self.appointment_details = self._make_fallback_details(
+                formatted_date, "Failed to create patient", doctor_name, doctor_specialty
+            )
+            return _APPT_PENDING_REPLY(doctor=doctor_name, date=formatted_date)
         
         try:
             # Try to create the appointment
@@ -480,42 +648,30 @@ class ClinicMateFunctions(llm.FunctionContext):
                 self.appointment_id = appointment.id
                 appointment_created = True
                 
-                # Get detailed appointment information
-                appointment_details = await database.get_appointment_details(appointment.id)
-                if appointment_details:
-                    self.appointment_details = appointment_details
-                    logger.info(f"Retrieved appointment details for ID {appointment.id}")
-                else:
-                    logger.warning(f"Could not retrieve appointment details for ID {appointment.id}")
-                    # Create minimal appointment details
-                    self.appointment_details = {
-                        'doctor': {'name': doctor_name, 'specialty': doctor_specialty},
-                        'date_time': formatted_date,
-                        'duration_minutes': 30,
-                        'status': 'scheduled',
-                        'appointment_id': appointment.id
-                    }
-            else:
-                # Create minimal appointment details for fallback when slot is unavailable
+                # create_appointment returns the doctor and specialty already loaded
+                if appointment.doctor:
+                    doctor_name = appointment.doctor.name
+                    if appointment.doctor.specialty:
+                        doctor_specialty = appointment.doctor.specialty.name
                 self.appointment_details = {
                     'doctor': {'name': doctor_name, 'specialty': doctor_specialty},
                     'date_time': formatted_date,
-                    'duration_minutes': 30,
-                    'status': 'pending',
-                    'error': "Time slot unavailable"
+                    'duration_minutes': appointment.duration_minutes,
+                    'status': appointment.status,
+                    'appointment_id': appointment.id
                 }
-                logger.warning(f"Failed to create appointment for {self.patient_name} with {doctor_name} at {formatted_date}")
-                return "I'm sorry, but that time slot is no longer available. Would you like to choose a different time?"
+                logger.info("Booked appointment ID %s", appointment.id)
+            else:
+                self.appointment_details = self._make_fallback_details(
+                    formatted_date, "Time slot unavailable", doctor_name, doctor_specialty
+                )
+                logger.warning("Failed to create appointment for %s with %s at %s", self.patient_name, doctor_name, formatted_date)
+                return _MSG_SLOT_UNAVAILABLE
         except Exception as e:
-            logger.error(f"Error during appointment booking: {str(e)}")
-            # Create minimal appointment details for fallback
-            self.appointment_details = {
-                'doctor': {'name': doctor_name, 'specialty': doctor_specialty},
-                'date_time': formatted_date,
-                'duration_minutes': 30,
-                'status': 'pending',
-                'error': str(e)
-            }
+            logger.error("Error during appointment booking: %s", e)
+            self.appointment_details = self._make_fallback_details(
+                formatted_date, str(e), doctor_name, doctor_specialty
+            )
         
         # Format a nice confirmation message
         if self.appointment_details.get('doctor', {}):
@@ -529,11 +685,11 @@ class ClinicMateFunctions(llm.FunctionContext):
         status = self.appointment_details.get('status', 'scheduled')
         
         if appointment_created:
-            logger.info(f"Successfully booked appointment for {self.patient_name} with {doctor_name} at {formatted_date}")
-            return f"Great news! I've successfully booked your appointment with {doctor_name}, our {specialty} specialist, for {formatted_date}. The appointment will last approximately 30 minutes. Please arrive 15 minutes early with your insurance card and ID. Would you like me to send a confirmation to your email or phone?"
+            logger.info("Successfully booked appointment for %s with %s at %s", self.patient_name, doctor_name, formatted_date)
+            return _APPT_BOOKED_REPLY(doctor=doctor_name, specialty=specialty, date=formatted_date)
         else:
-            logger.info(f"Created pending appointment for {self.patient_name} with {doctor_name} at {formatted_date}")
-            return f"I've scheduled your appointment with {doctor_name} for {formatted_date}. There was a small issue with our system, but your appointment request has been recorded. Our scheduling team will contact you to confirm. Would you like me to send a confirmation to your email or phone?"
+            logger.info("Created pending appointment for %s with %s at %s", self.patient_name, doctor_name, formatted_date)
+            return _APPT_PENDING_REPLY(doctor=doctor_name, date=formatted_date)
     
     @llm.ai_callable()
     async def cancel_appointment(self) -> str:
@@ -543,29 +699,30 @@ class ClinicMateFunctions(llm.FunctionContext):
         self.doctor_preference = None
         self.appointment_date_time = None
         
-        logger.info(f"Appointment booking canceled for patient: {self.patient_name}")
-        return "I've canceled the appointment booking process. You can always call back later to schedule an appointment. Is there anything else I can help you with today?"
+        logger.info("Appointment booking canceled for patient: %s", self.patient_name)
+        return _MSG_BOOKING_CANCELED
     
     @llm.ai_callable()
     async def send_appointment_confirmation(self, send_to_email: bool = True, send_to_phone: bool = False) -> str:
         """Send appointment confirmation to email and/or phone"""
         if not self.appointment_details:
-            return "There's no appointment to send confirmation for. Would you like to schedule an appointment?"
-        
-        confirmations_sent = []
+            return _MSG_NO_APPOINTMENT
         
-        if send_to_email and self.email:
-            # In a real system, this would send an actual email
-            logger.info(f"Sending appointment confirmation email to: {self.email}")
-            confirmations_sent.append(f"email ({self.email})")
+        email = self.email if send_to_email else None
+        phone = self.phone_number if send_to_phone else None
         
-        if send_to_phone and self.phone_number:
-            # In a real system, this would send an SMS
-            logger.info(f"Sending appointment confirmation SMS to: {self.phone_number}")
-            confirmations_sent.append(f"phone ({self.phone_number})")
-        
-        if confirmations_sent:
-            confirmation_str = " and ".join(confirmations_sent)
-            return f"I've sent your appointment confirmation to your {confirmation_str}. Is there anything else I can help you with today?"
+        # In a real system, these would send an actual email and SMS
+        if email:
+            logger.info("Sending appointment confirmation email to: %s", email)
+        if phone:
+            logger.info("Sending appointment confirmation SMS to: %s", phone)
+        
+        if email and phone:
+            target = f"email ({email}) and phone ({phone})"
+        elif email:
+            target = f"email ({email})"
+        elif phone:
+            target = f"phone ({phone})"
         else:
-            return "I couldn't send a confirmation because no email or phone number was provided. Your appointment is still confirmed in our system. Is there anything else I can help you with today?" 
\ No newline at end of file
+            return _MSG_NO_CONFIRMATION_CHANNEL
+        return f"I've sent your appointment confirmation to your {target}. Is there anything else I can help you with today?"
\ No newline at end of file
@@ -4,9 +4,16 @@ Functions for handling call termination and post-call processing.
 
 import logging
 import asyncio
+import re
 from datetime import datetime
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Coroutine, Dict, List, Optional, Any, Set, Tuple
 import os
+import queue
+import weakref
+from pathlib import Path
+
+import aiosmtplib
+from sqlalchemy.exc import SQLAlchemyError
 
 import database  # Import the database module
 from api import ClinicMateFunctions  # Import for type hints
@@ -15,56 +22,98 @@ from utils import (
     create_email_message,
     generate_html_email,
     get_email_credentials,
-    send_email_sync,
-    extract_data_from_conversation,
+    get_email_recipient,
+    send_email_async,
+    extract_fields_from_conversation,
     parse_date_of_birth
 )
 
 logger = logging.getLogger("call-processor")
 logger.setLevel(logging.INFO)
 
-async def process_call_end(patient_data: Dict[str, Any]) -> str:
+# Post-call side effects still running, per event loop; held here so they are not garbage
+# collected. Jobs on livekit's thread executor each run their own loop in this process.
+_BG_TASKS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Set[asyncio.Task]]" = weakref.WeakKeyDictionary()
+
+def _run_in_background(coro: Coroutine[Any, Any, Any]) -> asyncio.Task:
+    """Start coro without waiting for it; drain_background_tasks() waits for it at shutdown"""
+    task = asyncio.create_task(coro)
+    _BG_TASKS.setdefault(task.get_loop(), set()).add(task)
+    task.add_done_callback(_background_task_done)
+    return task
+
+def _background_task_done(task: asyncio.Task) -> None:
+    """Forget a finished background task and log anything it raised"""
+    _BG_TASKS.get(task.get_loop(), set()).discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Background task failed", exc_info=task.exception())
+
+async def drain_background_tasks() -> None:
+    """Wait for the confirmation emails and summary writes started on this event loop to finish"""
+    tasks = _BG_TASKS.get(asyncio.get_running_loop())
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+async def process_call_end(patient_data: Dict[str, Any], summary: Optional[str] = None,
+                           now: Optional[datetime] = None) -> str:
     """
     Process the end of a call by finalizing patient data and generating a call summary.
     
     Args:
         patient_data: Dictionary containing patient information collected during the call
+        summary: The call summary, if the caller already generated it
+        now: Time the call ended, defaults to the current time
         
     Returns:
         A summary string of actions taken
     """
     logger.info(f"Processing end of call for patient: {patient_data.get('patient_name', 'Unknown')}")
     
+    if now is None:
+        now = datetime.now()
+    
     actions_taken = []
     
     # Validate that required data has been collected
     missing_fields = check_required_fields(patient_data)
     if missing_fields:
         actions_taken.append(f"WARNING: Registration incomplete. Missing data: {', '.join(missing_fields)}")
-    else:
-        # Save patient data to database if all required information is available
+    
+    # Summarize up front; it only reads patient_data
+    if summary is None:
+        summary = generate_call_summary(patient_data, now=now)
+    
+    # Save patient data to database if all required information is available
+    if not missing_fields:
         patient = await save_to_database(patient_data)
         if patient:
             actions_taken.append(f"Patient data saved to database with ID: {patient.id}")
     
     # Save patient data to log
-    success = await save_patient_data(patient_data)
-    if success:
+    if save_patient_data(patient_data, now=now):
         actions_taken.append("Patient data saved to log")
     
-    # Generate and save call summary
-    summary = generate_call_summary(patient_data)
     if summary:
         actions_taken.append("Call summary generated")
     
-    # Send confirmation notification
+    # Send confirmation notification; the SMTP exchange finishes in the background
     if patient_data.get('email'):
-        sent = await send_confirmation_email(patient_data)
-        if sent:
-            actions_taken.append(f"Confirmation email sent to {patient_data['email']}")
+        _run_in_background(send_confirmation_email(patient_data, summary=summary))
+        actions_taken.append(f"Confirmation email queued for {patient_data['email']}")
     
     return "\n".join(actions_taken)
 
+# Fields a registration needs before it can be saved, with their display names
+_REQUIRED_FIELDS: Tuple[Tuple[str, str], ...] = (
+    ('patient_name', 'Name'),
+    ('date_of_birth', 'Date of Birth'),
+    ('insurance_provider', 'Insurance Provider'),
+    ('insurance_id', 'Insurance ID'),
+    ('medical_complaint', 'Reason for Visit'),
+    ('address', 'Address'),
+    ('phone_number', 'Phone Number'),
+)
+
 def check_required_fields(patient_data: Dict[str, Any]) -> List[str]:
     """
     Check if all required fields are filled.
@@ -75,23 +124,19 @@ def check_required_fields(patient_data: Dict[str, Any]) -> List[str]:
     Returns:
         List of missing field names
     """
-    required_fields = {
-        'patient_name': 'Name',
-        'date_of_birth': 'Date of Birth',
-        'insurance_provider': 'Insurance Provider',
-        'insurance_id': 'Insurance ID',
-        'medical_complaint': 'Reason for Visit',
-        'address': 'Address',
-        'phone_number': 'Phone Number'
-    }
-    
-    missing = []
-    
-    for field, display_name in required_fields.items():
-        if not patient_data.get(field):
-            missing.append(display_name)
-    
-    return missing
+    return [display_name for field, display_name in _REQUIRED_FIELDS if not patient_data.get(field)]
+
+# patient_data keys copied onto PatientCreate, with the field each one fills
+_DB_FIELD_MAP: Tuple[Tuple[str, str], ...] = (
+    ('email', 'email'),
+    ('phone_number', 'phone'),
+    ('address', 'address'),
+    ('insurance_provider', 'insurance_provider'),
+    ('insurance_id', 'insurance_id'),
+    ('has_referral', 'has_referral'),
+    ('referred_physician', 'referred_physician'),
+    ('medical_complaint', 'medical_complaint'),
+)
 
 async def save_to_database(patient_data: Dict[str, Any]) -> Optional[database.PatientRead]:
     """
@@ -120,63 +165,62 @@ async def save_to_database(patient_data: Dict[str, Any]) -> Optional[database.Pa
             dob = datetime.now().date()
         
         # Always create a new patient record - simplified approach
-        new_patient = database.PatientCreate(
-            name=name,
-            date_of_birth=dob,
-            email=patient_data.get('email'),
-            phone=patient_data.get('phone_number'),
-            address=patient_data.get('address'),
-            insurance_provider=patient_data.get('insurance_provider'),
-            insurance_id=patient_data.get('insurance_id'),
-            has_referral=patient_data.get('has_referral'),
-            referred_physician=patient_data.get('referred_physician'),
-            medical_complaint=patient_data.get('medical_complaint')
-        )
+        fields = {dst: patient_data.get(src) for src, dst in _DB_FIELD_MAP}
+        new_patient = database.PatientCreate(name=name, date_of_birth=dob, **fields)
         
         created_patient = await database.add_patient(new_patient)
+        if created_patient is None:
+            # add_patient logs its own errors
+            return None
         logger.info(f"Created new patient with ID: {created_patient.id}")
         return created_patient
             
-    except Exception as e:
+    except (SQLAlchemyError, ValueError) as e:
         logger.error(f"Error saving patient to database: {str(e)}")
         return None
 
-async def save_patient_data(patient_data: Dict[str, Any]) -> bool:
+def save_patient_data(patient_data: Dict[str, Any], now: Optional[datetime] = None) -> bool:
     """
     Save patient data to the log.
     
     Args:
         patient_data: Dictionary containing patient information
+        now: Time the data was collected, defaults to the current time
         
     Returns:
         True if save was successful, False otherwise
     """
-    try:
-        # Log the data
-        logger.info(f"Saving patient data: {patient_data}")
-        
-        # Simulate database operation with a short delay
-        await asyncio.sleep(0.5)
-        
-        # Log a timestamp of when the data was saved
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        logger.info(f"Patient data saved at: {timestamp}")
-        
-        return True
-    except Exception as e:
-        logger.error(f"Error saving patient data: {str(e)}")
-        return False
+    # Log the data
+    logger.info(f"Saving patient data: {patient_data}")
+    
+    # Log a timestamp of when the data was saved
+    timestamp = (now or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+    logger.info(f"Patient data saved at: {timestamp}")
+    
+    return True
 
-async def send_confirmation_email(patient_data: Dict[str, Any]) -> bool:
+# Plain text body of the confirmation email
+_TEXT_TEMPLATE = (
+    "CLINIC-MATE CALL SUMMARY\n\n"
+    "{summary}\n\n"
+    "This is an automated message from Clinic-Mate. Please do not reply to this email.\n"
+    "© {year} Assort Clinic. All rights reserved.\n"
+)
+
+async def send_confirmation_email(patient_data: Dict[str, Any], summary: Optional[str] = None) -> bool:
     """
     Send a confirmation email to the patient with their call summary.
     
     Args:
         patient_data: Dictionary containing patient information
+        summary: The call summary, if the caller already generated it
         
     Returns:
         True if email was sent successfully, False otherwise
     """
+    # One clock read serves the copyright year and the sent-at log line
+    now = datetime.now()
+    
     try:
         # Get patient information
         patient_name = patient_data.get('patient_name', 'Unknown')
@@ -184,7 +228,7 @@ async def send_confirmation_email(patient_data: Dict[str, Any]) -> bool:
         # Get email credentials from environment
         sender_email, password = get_email_credentials()
         # recipient_email = patient_data.get('email', os.environ.get("EMAIL_RECIPIENT"))
-        recipient_email = os.environ.get("EMAIL_RECIPIENT")
+        recipient_email = get_email_recipient()
 
         if not recipient_email:
             logger.warning(f"No email provided for {patient_name}, using default recipient")
@@ -194,21 +238,14 @@ async def send_confirmation_email(patient_data: Dict[str, Any]) -> bool:
             logger.error("Email credentials not set in environment variables")
             return False
                     
-        # Generate the call summary
-        call_summary = generate_call_summary(patient_data)
+        # Generate the call summary unless the caller passed it in
+        call_summary = summary if summary is not None else generate_call_summary(patient_data)
                     
         # Create the HTML content
         html_content = generate_html_email(call_summary, "Assort Medical Clinic Call Summary")
         
         # Create plain text version as a fallback
-        text_content = f"""
-        CLINIC-MATE CALL SUMMARY
-        
-        {call_summary}
-                
-        This is an automated message from Clinic-Mate. Please do not reply to this email.
-        © {datetime.now().year} Assort Clinic. All rights reserved.
-        """
+        text_content = _TEXT_TEMPLATE.format(summary=call_summary, year=now.year)
         
         # Create the email message
         message = create_email_message(
@@ -222,13 +259,12 @@ async def send_confirmation_email(patient_data: Dict[str, Any]) -> bool:
         # Connect to the SMTP server and send the email
         logger.info(f"Attempting to send email to: {recipient_email}")
             
-        # Use asyncio to run the blocking SMTP operations in a thread pool
-        success = await asyncio.to_thread(
-            send_email_sync,
+        # aiosmtplib keeps the SMTP exchange on the event loop
+        success = await send_email_async(
             sender_email,
             password,
             recipient_email,
-            message.as_string()
+            message
         )
         
         if not success:
@@ -236,29 +272,40 @@ async def send_confirmation_email(patient_data: Dict[str, Any]) -> bool:
             return False
                     
         # Log success
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
         logger.info(f"Confirmation email sent at: {timestamp}")
         
-        # Save a copy of the call summary to a file
-        timestamp_file = datetime.now().strftime('%Y%m%d_%H%M%S')
-        patient_name_safe = patient_name.replace(" ", "_")
-        filename = f"call_summary_{patient_name_safe}_{timestamp_file}.txt"
-        
-        # Write the file
-        with open(filename, "w") as f:
-            f.write(call_summary)
-        
-        logger.info(f"Call summary saved to file: {filename}")
-        
         return True
-    except Exception as e:
+    except (aiosmtplib.SMTPException, OSError) as e:
         logger.error(f"Error sending confirmation email: {str(e)}")
         return False
 
+# Transcript lines use the same format as agent.SYSTEM_FMT and agent.now_str()
+_TRANSCRIPT_TS_FMT = "%Y-%m-%d %H:%M:%S"
+_SYSTEM_FMT = "[{ts}] SYSTEM: {c}\n\n".format
+
+# Call summary files go under SUMMARY_DIR/YYYY/MM/DD
+SUMMARY_DIR = Path("call_summaries")
+
+# Anything other than letters, digits, underscores and hyphens is unsafe in a file name
+_NAME_SANITIZE = re.compile(r'[^A-Za-z0-9_-]+')
+
+def _safe_name(name: Optional[str]) -> str:
+    """Turn a patient name into a file-name-safe token"""
+    return _NAME_SANITIZE.sub('_', name or 'unknown')
+
+# ClinicMateFunctions attributes copied into patient_data at call end, including appointment information
+_PATIENT_FIELDS = (
+    'patient_name', 'date_of_birth', 'insurance_provider', 'insurance_id',
+    'has_referral', 'referred_physician', 'medical_complaint', 'address',
+    'phone_number', 'email', 'is_registered', 'registration_stage',
+    'wants_appointment', 'specialty_preference', 'doctor_preference', 'appointment_id',
+)
+
 async def process_call_end_from_context(
     fnc_ctx: ClinicMateFunctions, 
     patient_id: Optional[int] = None, 
-    log_queue: Optional[asyncio.Queue] = None
+    log_queue: Optional[queue.Queue] = None
 ) -> Tuple[Optional[int], str, bool]:
     """
     Process end-of-call tasks directly from function context, including data saving and summary generation
@@ -266,142 +313,133 @@ async def process_call_end_from_context(
     Args:
         fnc_ctx: The ClinicMateFunctions context with collected patient information
         patient_id: Optional existing patient ID if already saved
-        log_queue: Optional async queue for logging
+        log_queue: Optional transcript queue for logging
         
     Returns:
         Tuple containing (updated_patient_id, call_summary, success_status)
     """
     logger.info("Processing end of call tasks from context")
     
+    # One clock read stamps every transcript line and the summary file name
+    now = datetime.now()
+    ts = now.strftime(_TRANSCRIPT_TS_FMT)
+    
     # Log the current patient name and DOB for debugging
     logger.info(f"Patient name from context: {fnc_ctx.patient_name}")
     logger.info(f"Patient DOB from context: {fnc_ctx.date_of_birth}")
     
     # Try to extract missing patient name and DOB from conversation if they're not in the context
-    if (not fnc_ctx.patient_name or fnc_ctx.patient_name.strip() == "") and hasattr(fnc_ctx, 'conversation_history'):
-        extracted_name = extract_data_from_conversation(fnc_ctx.conversation_history, 'name')
+    missing = tuple(field for field, value in (('name', fnc_ctx.patient_name), ('dob', fnc_ctx.date_of_birth))
+                    if not value or value.strip() == "")
+    if missing:
+        # One pass over the transcript covers both fields
+        extracted = extract_fields_from_conversation(fnc_ctx.conversation_history, missing)
+        
+        extracted_name = extracted.get('name')
         if extracted_name:
             fnc_ctx.patient_name = extracted_name
             logger.info(f"Recovered patient name from conversation: {extracted_name}")
-    
-    if (not fnc_ctx.date_of_birth or fnc_ctx.date_of_birth.strip() == "") and hasattr(fnc_ctx, 'conversation_history'):
-        extracted_dob = extract_data_from_conversation(fnc_ctx.conversation_history, 'dob')
+            if log_queue:
+                log_queue.put_nowait(_SYSTEM_FMT(ts=ts, c=f"Extracted name from conversation: {extracted_name}"))
+        
+        extracted_dob = extracted.get('dob')
         if extracted_dob:
             fnc_ctx.date_of_birth = extracted_dob
             logger.info(f"Recovered patient DOB from conversation: {extracted_dob}")
+            if log_queue:
+                log_queue.put_nowait(_SYSTEM_FMT(ts=ts, c=f"Extracted DOB from conversation: {extracted_dob}"))
     
     # Convert function context to dictionary format
-    patient_data = {
-        'patient_name': fnc_ctx.patient_name,
-        'date_of_birth': fnc_ctx.date_of_birth,
-        'insurance_provider': fnc_ctx.insurance_provider,
-        'insurance_id': fnc_ctx.insurance_id,
-        'has_referral': fnc_ctx.has_referral,
-        'referred_physician': fnc_ctx.referred_physician,
-        'medical_complaint': fnc_ctx.medical_complaint,
-        'address': fnc_ctx.address,
-        'phone_number': fnc_ctx.phone_number,
-        'email': fnc_ctx.email,
-        'is_registered': fnc_ctx.is_registered,
-        'registration_stage': fnc_ctx.registration_stage,
-        # Include appointment information
-        'wants_appointment': fnc_ctx.wants_appointment,
-        'specialty_preference': fnc_ctx.specialty_preference,
-        'doctor_preference': fnc_ctx.doctor_preference,
-        'appointment_id': fnc_ctx.appointment_id
-    }
+    patient_data = {field: getattr(fnc_ctx, field) for field in _PATIENT_FIELDS}
     
     # Add appointment details if they exist
-    if hasattr(fnc_ctx, 'appointment_details') and fnc_ctx.appointment_details:
+    if fnc_ctx.appointment_details:
         patient_data['appointment_details'] = fnc_ctx.appointment_details
         logger.info(f"Including appointment details in call summary: {fnc_ctx.appointment_details}")
     
-    # Try to save the patient to the database if we have the necessary info
-    if patient_id is None:
-        # Check if we have name and DOB
-        have_name = bool(fnc_ctx.patient_name and fnc_ctx.patient_name.strip())
-        have_dob = bool(fnc_ctx.date_of_birth and fnc_ctx.date_of_birth.strip())
+    # Patient save, appointment lookup and the final database save share one session
+    async with database.shared_session():
+        # Try to save the patient to the database if we have the necessary info
+        if patient_id is None:
+            # Check if we have name and DOB
+            have_name = bool(fnc_ctx.patient_name and fnc_ctx.patient_name.strip())
+            have_dob = bool(fnc_ctx.date_of_birth and fnc_ctx.date_of_birth.strip())
         
-        # If we're missing either name or DOB, try to extract them from conversation
-        if not have_name or not have_dob:
-            logger.warning(f"Missing critical patient data: Name: {have_name}, DOB: {have_dob}")
-            
-            # Try to extract missing name from conversation
-            if not have_name and hasattr(fnc_ctx, 'conversation_history'):
-                extracted_name = extract_data_from_conversation(fnc_ctx.conversation_history, 'name')
-                if extracted_name:
-                    fnc_ctx.patient_name = extracted_name
-                    patient_data['patient_name'] = extracted_name
-                    have_name = True
-                    logger.info(f"Extracted patient name from conversation: {extracted_name}")
-                    if log_queue:
-                        log_queue.put_nowait(f"[{datetime.now()}] SYSTEM: Extracted name from conversation: {extracted_name}\n\n")
-            
-            # Try to extract missing DOB from conversation
-            if not have_dob and hasattr(fnc_ctx, 'conversation_history'):
-                extracted_dob = extract_data_from_conversation(fnc_ctx.conversation_history, 'dob')
-                if extracted_dob:
-                    fnc_ctx.date_of_birth = extracted_dob
-                    patient_data['date_of_birth'] = extracted_dob
-                    have_dob = True
-                    logger.info(f"Extracted patient DOB from conversation: {extracted_dob}")
-                    if log_queue:
-                        log_queue.put_nowait(f"[{datetime.now()}] SYSTEM: Extracted DOB from conversation: {extracted_dob}\n\n")
+            # Extraction from the conversation already ran above, so a gap here is final
+            if not have_name or not have_dob:
+                logger.warning(f"Missing critical patient data: Name: {have_name}, DOB: {have_dob}")
         
-        # If we have the minimum required fields, save the patient
-        if have_name and have_dob:
-            try:
-                # Check if patient_id is stored in the function context
-                if hasattr(fnc_ctx, 'database_patient_id') and fnc_ctx.database_patient_id:
-                    patient_id = fnc_ctx.database_patient_id
-                    logger.info(f"Using existing patient ID from context: {patient_id}")
-                else:
-                    patient_id = await database.save_patient_from_context(fnc_ctx)
-                    if patient_id:
-                        patient_data['patient_id'] = patient_id
-                        logger.info(f"Patient saved to database with ID: {patient_id}")
+            # If we have the minimum required fields, save the patient
+            if have_name and have_dob:
+                try:
+                    # Check if patient_id is stored in the function context
+                    if fnc_ctx.database_patient_id is not None:
+                        patient_id = fnc_ctx.database_patient_id
+                        logger.info(f"Using existing patient ID from context: {patient_id}")
                     else:
-                        logger.warning("Failed to save patient to database at end of call")
+                        patient_id = await database.save_patient_from_context(fnc_ctx)
+                        if patient_id:
+                            patient_data['patient_id'] = patient_id
+                            logger.info(f"Patient saved to database with ID: {patient_id}")
+                        else:
+                            logger.warning("Failed to save patient to database at end of call")
+                except Exception as e:
+                    logger.error(f"Error saving patient to database at end of call: {str(e)}")
+            else:
+                logger.warning(f"Cannot save patient to database: Missing name ({have_name}) or date of birth ({have_dob})")
+        
+        # If we have an appointment ID but not the details, try to fetch them now
+        if fnc_ctx.appointment_id and not fnc_ctx.appointment_details:
+            try:
+                appointment_details = await database.get_appointment_details(fnc_ctx.appointment_id)
+                if appointment_details:
+                    patient_data['appointment_details'] = appointment_details
+                    logger.info(f"Retrieved appointment details for ID: {fnc_ctx.appointment_id}")
             except Exception as e:
-                logger.error(f"Error saving patient to database at end of call: {str(e)}")
-        else:
-            logger.warning(f"Cannot save patient to database: Missing name ({have_name}) or date of birth ({have_dob})")
-    
-    # If we have an appointment ID but not the details, try to fetch them now
-    if fnc_ctx.appointment_id and not fnc_ctx.appointment_details:
-        try:
-            appointment_details = await database.get_appointment_details(fnc_ctx.appointment_id)
-            if appointment_details:
-                patient_data['appointment_details'] = appointment_details
-                logger.info(f"Retrieved appointment details for ID: {fnc_ctx.appointment_id}")
-        except Exception as e:
-            logger.error(f"Error retrieving appointment details: {str(e)}")
-    
-    # Process the end of call using our regular process_call_end function
-    summary = await process_call_end(patient_data)
+                logger.error(f"Error retrieving appointment details: {str(e)}")
+        
+        # Generate the call summary once; process_call_end and the email reuse it
+        call_summary = generate_call_summary(patient_data, now=now)
+        
+        # Process the end of call using our regular process_call_end function
+        summary = await process_call_end(patient_data, summary=call_summary, now=now)
     
     # Log the summary of actions taken if a log queue was provided
     if log_queue:
-        log_queue.put_nowait(f"[{datetime.now()}] SYSTEM: End of call processing complete:\n{summary}\n\n")
-    
-    # Generate a call summary
-    call_summary = generate_call_summary(patient_data)
+        log_queue.put_nowait(_SYSTEM_FMT(ts=ts, c=f"End of call processing complete:\n{summary}"))
     
     # Log the call summary if a log queue was provided
     if log_queue:
-        log_queue.put_nowait(f"[{datetime.now()}] SYSTEM: CALL SUMMARY:\n{call_summary}\n\n")
+        log_queue.put_nowait(_SYSTEM_FMT(ts=ts, c=f"CALL SUMMARY:\n{call_summary}"))
     
-    try:
-        # Save the call summary to a separate file
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        patient_name = fnc_ctx.patient_name or "unknown"
-        filename = f"call_summary_{patient_name.replace(' ', '_')}_{timestamp}.txt"
+    # Save the call summary to a separate file, under a directory for the day, in the background
+    timestamp = now.strftime('%Y%m%d_%H%M%S')
+    filename = SUMMARY_DIR / now.strftime('%Y/%m/%d') / f"call_summary_{_safe_name(fnc_ctx.patient_name)}_{timestamp}.txt"
+    _run_in_background(write_call_summary(filename, call_summary))
+    
+    return patient_id, call_summary, True
+
+def _write_text(path: Path, text: str) -> None:
+    """Create the parent directories of path and write text to it"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+async def write_call_summary(filename: Path, call_summary: str) -> bool:
+    """
+    Write a call summary to a file.
+    
+    Args:
+        filename: Path of the file to write; missing parent directories are created
+        call_summary: The summary text
         
-        from aiofile import async_open as open
-        async with open(filename, "w") as f:
-            await f.write(call_summary)
-            logger.info(f"Call summary saved to file: {filename}")
+    Returns:
+        True if the file was written, False otherwise
+    """
+    try:
+        # Directory creation and the write share one worker-thread hop
+        await asyncio.to_thread(_write_text, filename, call_summary)
+        logger.info(f"Call summary saved to file: {filename}")
+        return True
     except Exception as e:
         logger.error(f"Error saving call summary: {str(e)}")
-    
-    return patient_id, call_summary, True 
+        return False
@@ -5,16 +5,18 @@ Uses SQLModel (SQLAlchemy + Pydantic) for type-safe database interactions.
 
 import logging
 from datetime import date, datetime
-from typing import Optional, List, Dict, Any
+from typing import TYPE_CHECKING, Optional, List, Dict, Any, Tuple
 
 from sqlmodel import Field, SQLModel, Session, create_engine, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.orm.session import make_transient_to_detached
 from contextlib import asynccontextmanager
+from contextvars import ContextVar
 import asyncio
+import time
 
-# Import ClinicMateFunctions for proper type hints
-from api import ClinicMateFunctions
+if TYPE_CHECKING:
+    from api import ClinicMateFunctions
 
 # Create a logger
 logger = logging.getLogger("database")
@@ -23,8 +25,15 @@ logger.setLevel(logging.INFO)
 # Assuming SQLite for simplicity - can be changed to PostgreSQL, MySQL, etc.
 DATABASE_URL = "sqlite:///./clinic_mate.db"
 
-# Create async engine for SQLModel
-engine = create_engine(DATABASE_URL, echo=False)
+# Create the engine for SQLModel. Sessions check connections out of its pool
+# rather than opening one per query; pre-ping only matters for networked databases.
+engine = create_engine(
+    DATABASE_URL,
+    echo=False,
+    pool_size=10,
+    max_overflow=20,
+    pool_pre_ping=not DATABASE_URL.startswith("sqlite"),
+)
 
 # Models
 
@@ -161,9 +170,24 @@ def create_db_and_tables():
         raise
 
 
+# Session bound by shared_session() for the current task, if any
+_current_session: ContextVar[Optional[Session]] = ContextVar("db_session", default=None)
+
+
 @asynccontextmanager
 async def get_session():
     """Get a database session - async context manager"""
+    session = _current_session.get()
+    if session is not None:
+        # Inside shared_session(): reuse its session and leave closing to it
+        try:
+            yield session
+        finally:
+            # A failed flush leaves the session unusable until it is rolled back
+            if not session.is_active:
+                session.rollback()
+        return
+    
     session = Session(engine)
     try:
         yield session
@@ -171,6 +195,28 @@ async def get_session():
         session.close()
 
 
+@asynccontextmanager
+async def shared_session():
+    """
+    Make the database calls inside this block share one session and connection
+    
+    Nested blocks reuse the outer session. Only wrap work done within a single
+    tool call; holding a session across LLM turns would keep the connection
+    checked out and serve stale rows from the identity map.
+    """
+    if _current_session.get() is not None:
+        yield
+        return
+    
+    session = Session(engine)
+    token = _current_session.set(session)
+    try:
+        yield
+    finally:
+        _current_session.reset(token)
+        session.close()
+
+
 async def add_patient(patient_data: PatientCreate) -> Optional[PatientRead]:
     """
     Add a new patient to the database
@@ -412,7 +458,7 @@ async def get_full_patient_data(patient_id: int) -> Dict[str, Any]:
 
 # Functions moved from agent.py to improve modularity
 
-async def save_patient_from_context(fnc_ctx: ClinicMateFunctions) -> int:
+async def save_patient_from_context(fnc_ctx: "ClinicMateFunctions") -> int:
     """
     Save patient information from function context to the database
     
@@ -483,57 +529,48 @@ async def save_patient_from_context(fnc_ctx: ClinicMateFunctions) -> int:
         logger.error(f"Error creating patient: {str(e)}")
         return None
 
-async def update_patient_from_context(patient_id: int, fnc_ctx: ClinicMateFunctions, updated_field: str) -> bool:
+# Patient columns written by each collect_* function, mapped to the function context
+# attribute holding the value
+PATIENT_UPDATE_COLUMNS: Dict[str, Dict[str, str]] = {
+    "collect_insurance_info": {
+        "insurance_provider": "insurance_provider",
+        "insurance_id": "insurance_id",
+        "has_referral": "has_referral",
+        "referred_physician": "referred_physician",
+    },
+    "collect_medical_complaint": {"medical_complaint": "medical_complaint"},
+    "collect_address": {"address": "address"},
+    "collect_phone": {"phone": "phone_number"},
+    "collect_email": {"email": "email"},
+}
+
+# Columns that must all be filled in before an update is written; the referral columns and
+# email are optional, so a declined email is still recorded
+PATIENT_UPDATE_REQUIRED = frozenset({"insurance_provider", "insurance_id", "medical_complaint", "address", "phone"})
+
+async def update_patient_from_context(patient_id: int, fnc_ctx: "ClinicMateFunctions", columns: Dict[str, str]) -> bool:
     """
     Update specific fields of an existing patient record based on newly collected information
     
     Args:
         patient_id: The ID of the patient to update
         fnc_ctx: The ClinicMateFunctions context with patient information
-        updated_field: The name of the function that was called to update information
+        columns: Patient columns to update mapped to their function context attributes
+            (an entry of PATIENT_UPDATE_COLUMNS)
             
     Returns:
         True if successful, False otherwise
     """
     try:
-        # Handle different types of updates based on the function that was called
-        if updated_field == "collect_insurance_info" and fnc_ctx.insurance_provider and fnc_ctx.insurance_id:
-            # Update insurance information
-            insurance_success = await update_insurance_info(
-                patient_id=patient_id,
-                provider=fnc_ctx.insurance_provider,
-                insurance_id=fnc_ctx.insurance_id,
-                has_referral=fnc_ctx.has_referral,
-                referred_physician=fnc_ctx.referred_physician
-            )
-            
-            if insurance_success:
-                logger.info(f"Updated insurance information for patient: {patient_id}")
-                return True
-        
-        elif updated_field == "collect_medical_complaint" and fnc_ctx.medical_complaint:
-            # Update medical complaint
-            medical_success = await update_medical_complaint(
-                patient_id=patient_id,
-                complaint=fnc_ctx.medical_complaint
-            )
-            
-            if medical_success:
-                logger.info(f"Updated medical record for patient: {patient_id}")
-                return True
+        values = {column: getattr(fnc_ctx, attr) for column, attr in columns.items()}
+        # Don't overwrite the stored record with a half-collected one
+        if not all(value for column, value in values.items() if column in PATIENT_UPDATE_REQUIRED):
+            return False
         
-        elif updated_field in ("collect_address", "collect_phone", "collect_email"):
-            # Update contact information
-            update_data = PatientUpdate(
-                email=fnc_ctx.email,
-                phone=fnc_ctx.phone_number,
-                address=fnc_ctx.address
-            )
-            
-            updated_patient = await update_patient(patient_id, update_data)
-            if updated_patient:
-                logger.info(f"Updated contact information for patient: {patient_id}")
-                return True
+        updated_patient = await update_patient(patient_id, PatientUpdate(**values))
+        if updated_patient:
+            logger.info(f"Updated {', '.join(values)} for patient: {patient_id}")
+            return True
         
         return False
     except Exception as e:
@@ -567,6 +604,7 @@ async def add_specialty(name: str, description: Optional[str] = None) -> Optiona
             session.add(specialty)
             session.commit()
             session.refresh(specialty)
+            clear_specialty_cache()
             
             # Convert to SpecialtyRead without using from_orm which causes the _sa_instance_state issue
             return SpecialtyRead(id=specialty.id, name=specialty.name, description=specialty.description)
@@ -609,6 +647,7 @@ async def add_doctor(
             session.add(doctor)
             session.commit()
             session.refresh(doctor)
+            clear_doctor_cache()
             
             # Convert to DoctorRead without using from_orm
             return DoctorRead(id=doctor.id, name=doctor.name, specialty_id=doctor.specialty_id, bio=doctor.bio)
@@ -784,7 +823,7 @@ async def create_appointment(
         notes: Optional notes for the appointment
         
     Returns:
-        The created appointment with ID
+        The created appointment with ID, with its doctor and specialty loaded
     """
     async with get_session() as session:
         try:
@@ -832,7 +871,25 @@ async def create_appointment(
             session.commit()
             session.refresh(appointment)
             
-            # Get the full appointment details with patient and doctor
+            # Load the doctor and specialty in the same session so callers
+            # don't need a separate get_appointment_details round-trip
+            doctor_row = session.exec(
+                select(Doctor, Specialty)
+                .join(Specialty, Specialty.id == Doctor.specialty_id, isouter=True)
+                .where(Doctor.id == doctor_id)
+            ).first()
+            doctor_read = None
+            if doctor_row:
+                doctor, specialty = doctor_row
+                doctor_read = DoctorRead(
+                    id=doctor.id,
+                    name=doctor.name,
+                    specialty_id=doctor.specialty_id,
+                    bio=doctor.bio,
+                    specialty=SpecialtyRead(id=specialty.id, name=specialty.name, description=specialty.description) if specialty else None
+                )
+            
+            # Get the full appointment details with the doctor
             app_read = AppointmentRead(
                 id=appointment.id,
                 patient_id=appointment.patient_id,
@@ -841,7 +898,8 @@ async def create_appointment(
                 duration_minutes=appointment.duration_minutes,
                 status=appointment.status,
                 notes=appointment.notes,
-                created_at=appointment.created_at
+                created_at=appointment.created_at,
+                doctor=doctor_read
             )
             return app_read
         except Exception as e:
@@ -1229,4 +1287,72 @@ async def find_specialty_by_name(specialty_name: str) -> Optional[SpecialtyRead]
             return None
     except Exception as e:
         logger.error(f"Error finding specialty by name: {str(e)}")
-        return None 
\ No newline at end of file
+        return None 
+
+
+# Catalog caches for the booking tools. Specialty names are refreshed at most every
+# SPECIALTY_CACHE_TTL seconds and name lookups every LOOKUP_CACHE_TTL seconds; lookups
+# keep hits only, so a miss is retried next time. add_specialty and add_doctor clear
+# them, and the TTLs cover catalog changes made by other processes.
+SPECIALTY_CACHE_TTL = 300
+_SPECIALTY_CACHE: Dict[str, Any] = {"expires_at": 0.0, "options_str": None}
+LOOKUP_CACHE_TTL = 300
+_LOOKUP_CACHE_SIZE = 256
+# Normalized name -> (expires_at, result)
+_DOCTOR_BY_NAME: Dict[str, Tuple[float, DoctorRead]] = {}
+_SPECIALTY_BY_NAME: Dict[str, Tuple[float, SpecialtyRead]] = {}
+
+async def get_specialty_options(ttl: float = SPECIALTY_CACHE_TTL) -> str:
+    """
+    Get the comma-separated names of all specialties, querying only when the cache is stale
+    
+    Args:
+        ttl: Seconds a fresh result is reused for
+        
+    Returns:
+        The specialty names, or an empty string if none could be loaded
+    """
+    now = time.monotonic()
+    if now < _SPECIALTY_CACHE["expires_at"]:
+        return _SPECIALTY_CACHE["options_str"]
+    
+    specialties = await get_all_specialties()
+    options_str = ", ".join(s.name for s in specialties)
+    # An empty list usually means the query failed, so do not keep it
+    if specialties:
+        _SPECIALTY_CACHE.update(options_str=options_str, expires_at=now + ttl)
+    return options_str
+
+def clear_specialty_cache() -> None:
+    """Drop the cached specialty names and lookups; called after the specialty table changes"""
+    _SPECIALTY_CACHE.update(expires_at=0.0, options_str=None)
+    _SPECIALTY_BY_NAME.clear()
+
+def clear_doctor_cache() -> None:
+    """Drop the cached doctor lookups; called after the doctor table changes"""
+    _DOCTOR_BY_NAME.clear()
+
+async def _cached_lookup(cache: Dict[str, Tuple[float, Any]], name: str, find, ttl: float = LOOKUP_CACHE_TTL) -> Any:
+    """Resolve name with find(name), reusing recent hits for the same normalized name"""
+    key = name.strip().lower()
+    now = time.monotonic()
+    entry = cache.get(key)
+    if entry is not None and now < entry[0]:
+        return entry[1]
+    
+    found = await find(name)
+    if found is None:
+        cache.pop(key, None)
+    else:
+        if key not in cache and len(cache) >= _LOOKUP_CACHE_SIZE:
+            del cache[next(iter(cache))]
+        cache[key] = (now + ttl, found)
+    return found
+
+async def find_doctor_cached(doctor_name: str) -> Optional[DoctorRead]:
+    """find_doctor_by_name, reusing recent hits for the same name"""
+    return await _cached_lookup(_DOCTOR_BY_NAME, doctor_name, find_doctor_by_name)
+
+async def find_specialty_cached(specialty_name: str) -> Optional[SpecialtyRead]:
+    """find_specialty_by_name, reusing recent hits for the same name"""
+    return await _cached_lookup(_SPECIALTY_BY_NAME, specialty_name, find_specialty_by_name)
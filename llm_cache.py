@@ -0,0 +1,235 @@
+"""
+Response cache for deterministic LLM turns in the registration flow.
+
+Only turns generated at temperature 0 during the scripted early registration stages are
+cached. The key covers the model, the stage, the full chat history and the tool names,
+so a hit means the request would have been byte-identical.
+"""
+
+import collections
+import dataclasses
+import hashlib
+import json
+import logging
+from typing import Any, Dict, Iterable, Optional, Protocol
+
+from livekit.agents import DEFAULT_API_CONNECT_OPTIONS, APIConnectOptions, llm, utils
+
+logger = logging.getLogger("llm-cache")
+logger.setLevel(logging.INFO)
+
+# Registration stages whose replies depend only on the transcript so far
+CACHEABLE_STAGES = frozenset({"initial", "basic_info_collected", "insurance_collected"})
+
+
+class CacheBackend(Protocol):
+    """Storage used by LLMCache; values are JSON-serializable dicts"""
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]: ...
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None: ...
+
+
+class InMemoryBackend:
+    """Process-local LRU backend"""
+
+    def __init__(self, maxsize: int = 1024):
+        self._items: "collections.OrderedDict[str, Dict[str, Any]]" = collections.OrderedDict()
+        self._maxsize = maxsize
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self._items.get(key)
+        if value is not None:
+            self._items.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self._maxsize:
+            self._items.popitem(last=False)
+
+
+def _message_repr(msg: llm.ChatMessage) -> Optional[Dict[str, Any]]:
+    """JSON-friendly view of a chat message for the cache key, or None if it is not cacheable"""
+    content = msg.content
+    if type(content) is list:
+        if not all(isinstance(part, str) for part in content):
+            # Images and audio have no stable text form
+            return None
+    repr_ = {"role": msg.role, "name": msg.name, "content": content}
+    if msg.tool_calls:
+        repr_["tool_calls"] = [(call.function_info.name, call.raw_arguments) for call in msg.tool_calls]
+    return repr_
+
+
+class LLMCache:
+    """SHA-256 keyed response cache over a pluggable backend"""
+
+    def __init__(self, backend: Optional[CacheBackend] = None):
+        self._backend = backend or InMemoryBackend()
+
+    @staticmethod
+    def make_key(model: str, stage: str, chat_ctx: llm.ChatContext, tool_names: Iterable[str]) -> Optional[str]:
+        """
+        Build the cache key for a request
+
+        Args:
+            model: The model the request is sent to
+            stage: The current registration stage
+            chat_ctx: The chat context being sent
+            tool_names: Names of the functions offered to the model
+
+        Returns:
+            Hex digest of the request, or None if the context holds non-text content
+        """
+        messages = [_message_repr(msg) for msg in chat_ctx.messages]
+        if None in messages:
+            return None
+        payload = {"model": model, "stage": stage, "messages": messages, "tools": sorted(tool_names)}
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return await self._backend.get(key)
+
+    async def set(self, key: str, resp: Dict[str, Any]) -> None:
+        await self._backend.set(key, resp)
+
+
+class CachedLLM(llm.LLM):
+    """Wraps another LLM and replays cached responses for deterministic registration turns"""
+
+    def __init__(
+        self,
+        inner: llm.LLM,
+        *,
+        model: str,
+        temperature: Optional[float] = None,
+        cache: Optional[LLMCache] = None,
+    ):
+        super().__init__(capabilities=inner.capabilities)
+        self._inner = inner
+        self._model = model
+        self._temperature = temperature
+        self._cache = cache or LLMCache()
+
+    def chat(
+        self,
+        *,
+        chat_ctx: llm.ChatContext,
+        conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
+        fnc_ctx: Optional[llm.FunctionContext] = None,
+        temperature: Optional[float] = None,
+        n: Optional[int] = None,
+        parallel_tool_calls: Optional[bool] = None,
+        tool_choice=None,
+    ) -> llm.LLMStream:
+        if temperature is None:
+            temperature = self._temperature
+
+        key = None
+        stage = getattr(fnc_ctx, "registration_stage", None)
+        if temperature == 0 and (n or 1) == 1 and stage in CACHEABLE_STAGES:
+            key = LLMCache.make_key(self._model, stage, chat_ctx, fnc_ctx.ai_functions)
+
+        return _CachedLLMStream(
+            self,
+            chat_ctx=chat_ctx,
+            fnc_ctx=fnc_ctx,
+            conn_options=conn_options,
+            key=key,
+            chat_kwargs=dict(
+                temperature=temperature,
+                n=n,
+                parallel_tool_calls=parallel_tool_calls,
+                tool_choice=tool_choice,
+            ),
+        )
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+class _CachedLLMStream(llm.LLMStream):
+    def __init__(
+        self,
+        cached_llm: CachedLLM,
+        *,
+        chat_ctx: llm.ChatContext,
+        fnc_ctx: Optional[llm.FunctionContext],
+        conn_options: APIConnectOptions,
+        key: Optional[str],
+        chat_kwargs: Dict[str, Any],
+    ):
+        # Retries are left to the wrapped LLM's stream
+        super().__init__(
+            cached_llm,
+            chat_ctx=chat_ctx,
+            fnc_ctx=fnc_ctx,
+            conn_options=dataclasses.replace(conn_options, max_retry=0),
+        )
+        self._cached_llm = cached_llm
+        self._inner_conn_options = conn_options
+        self._key = key
+        self._chat_kwargs = chat_kwargs
+
+    async def _run(self) -> None:
+        cache = self._cached_llm._cache
+        if self._key is not None:
+            cached = await cache.get(self._key)
+            if cached is not None and self._replay(cached):
+                return
+
+        content_parts = []
+        tool_calls = []
+        inner_stream = self._cached_llm._inner.chat(
+            chat_ctx=self._chat_ctx,
+            conn_options=self._inner_conn_options,
+            fnc_ctx=self._fnc_ctx,
+            **self._chat_kwargs,
+        )
+        async with inner_stream:
+            async for chunk in inner_stream:
+                for choice in chunk.choices:
+                    if choice.delta.content:
+                        content_parts.append(choice.delta.content)
+                    if choice.delta.tool_calls:
+                        self._function_calls_info.extend(choice.delta.tool_calls)
+                        tool_calls.extend(
+                            {"name": call.function_info.name, "raw_arguments": call.raw_arguments, "arguments": call.arguments}
+                            for call in choice.delta.tool_calls
+                        )
+                self._event_ch.send_nowait(chunk)
+
+        if self._key is not None and (content_parts or tool_calls):
+            await cache.set(self._key, {"content": "".join(content_parts), "tool_calls": tool_calls})
+
+    def _replay(self, cached: Dict[str, Any]) -> bool:
+        """Emit a cached response, binding its tool calls to this session's functions"""
+        calls = []
+        for call in cached["tool_calls"]:
+            info = self._fnc_ctx.ai_functions.get(call["name"]) if self._fnc_ctx else None
+            if info is None:
+                return False
+            calls.append(llm.FunctionCallInfo(
+                tool_call_id=f"call_{utils.shortuuid()}",
+                function_info=info,
+                raw_arguments=call["raw_arguments"],
+                arguments=call["arguments"],
+            ))
+
+        request_id = utils.shortuuid()
+        if cached["content"]:
+            self._event_ch.send_nowait(llm.ChatChunk(
+                request_id=request_id,
+                choices=[llm.Choice(delta=llm.ChoiceDelta(role="assistant", content=cached["content"]))],
+            ))
+        for call in calls:
+            self._function_calls_info.append(call)
+            self._event_ch.send_nowait(llm.ChatChunk(
+                request_id=request_id,
+                choices=[llm.Choice(delta=llm.ChoiceDelta(role="assistant", tool_calls=[call]))],
+            ))
+
+        logger.info(f"Served LLM response from cache ({len(calls)} tool calls)")
+        return True
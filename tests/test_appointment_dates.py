@@ -0,0 +1,87 @@
+from datetime import date, datetime
+
+import pytest
+
+import api
+import database
+
+TODAY = date(2026, 10, 15)
+
+
+@pytest.fixture(autouse=True)
+def clear_parse_cache():
+    api._parse_appointment_date.cache_clear()
+    yield
+    api._parse_appointment_date.cache_clear()
+
+
+@pytest.mark.parametrize("spoken, expected", [
+    ("2026-10-20 09:00", datetime(2026, 10, 20, 9, 0)),
+    ("2026-10-20T14:30", datetime(2026, 10, 20, 14, 30)),
+    ("Tuesday, October 20, 2026 at 10:00 AM", datetime(2026, 10, 20, 10, 0)),
+    ("October 20, 2026 at 2:30 PM", datetime(2026, 10, 20, 14, 30)),
+    ("October 20 at 10:30 AM", datetime(2026, 10, 20, 10, 30)),
+    ("Oct. 21, 2026 at 9:30 AM", datetime(2026, 10, 21, 9, 30)),
+    ("10/20/2026 2:00 PM", datetime(2026, 10, 20, 14, 0)),
+    ("May 4, 2027 at 11:00 AM", datetime(2027, 5, 4, 11, 0)),
+    ("Sept 3, 2027 at 9:00 AM", datetime(2027, 9, 3, 9, 0)),
+    ("Thursday, October 15, 2026", datetime(2026, 10, 15, 9, 0)),
+])
+def test_parses_explicit_dates(spoken, expected):
+    assert api._parse_appointment_date(spoken, TODAY) == expected
+
+
+@pytest.mark.parametrize("spoken", [
+    "next Tuesday at 10",
+    "tomorrow at 3pm",
+    "I'd like 3 please",
+    "Tuesday at 10",
+    "October 20 next week",
+    "sometime soon",
+    "",
+    # Words that start like month names are not dates
+    "Tuesday 10am, marginally flexible",
+    "maybe Tuesday at 10",
+    "Dr. Martinez on Tuesday at 10",
+    "I decided on Friday at 2pm",
+    "junior doctor on Thursday at 11",
+    "May I come Tuesday at 10",
+])
+def test_rejects_relative_or_partial_dates(spoken):
+    assert api._parse_appointment_date(spoken, TODAY) is None
+
+
+@pytest.mark.parametrize("spoken", [
+    "2020-01-01 09:00",
+    "October 1, 2026 at 9:00 AM",
+    "January 5 at 10",
+])
+def test_rejects_past_dates(spoken):
+    assert api._parse_appointment_date(spoken, TODAY) is None
+
+
+@pytest.mark.asyncio
+async def test_book_appointment_falls_back_for_relative_date(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    doctor = database.DoctorRead(
+        id=1, name="Dr. Smith", specialty_id=1, bio=None,
+        specialty=database.SpecialtyRead(id=1, name="Cardiology", description=None),
+    )
+
+    async def find_doctor(name):
+        return doctor
+
+    async def create_appointment(**kwargs):
+        raise AssertionError("an unparsed date must not be booked")
+
+    monkeypatch.setattr(database, "find_doctor_cached", find_doctor)
+    monkeypatch.setattr(database, "create_appointment", create_appointment)
+
+    fnc = api.ClinicMateFunctions()
+    fnc.doctor_preference = "Dr. Smith"
+    reply = await fnc.book_appointment(date_time_str="next Tuesday at 10")
+
+    assert "scheduling team will contact you" in reply
+    assert fnc.appointment_details["status"] == "pending"
+    assert fnc.appointment_details["error"] == "Could not parse date: next Tuesday at 10"
+    assert fnc.appointment_date_time is None
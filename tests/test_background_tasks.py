@@ -0,0 +1,36 @@
+import asyncio
+
+import call_processor
+
+
+def test_each_event_loop_drains_its_own_summary_writes(tmp_path):
+    # livekit's thread executor runs every job on a fresh event loop in the same process
+    async def job(n):
+        call_processor._run_in_background(call_processor.write_call_summary(tmp_path / f"s{n}.txt", f"summary {n}"))
+        await call_processor.drain_background_tasks()
+
+    asyncio.run(job(0))
+    asyncio.run(job(1))
+
+    assert (tmp_path / "s0.txt").read_text() == "summary 0"
+    assert (tmp_path / "s1.txt").read_text() == "summary 1"
+
+
+def test_drain_waits_for_tasks_and_survives_failures():
+    finished = []
+
+    async def slow():
+        await asyncio.sleep(0.01)
+        finished.append("slow")
+
+    async def broken():
+        raise RuntimeError("boom")
+
+    async def job():
+        call_processor._run_in_background(slow())
+        call_processor._run_in_background(broken())
+        await call_processor.drain_background_tasks()
+        assert not call_processor._BG_TASKS.get(asyncio.get_running_loop())
+
+    asyncio.run(job())
+    assert finished == ["slow"]
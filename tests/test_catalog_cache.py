@@ -0,0 +1,124 @@
+from types import SimpleNamespace
+
+import pytest
+
+import database
+
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    database.clear_specialty_cache()
+    database._DOCTOR_BY_NAME.clear()
+    yield
+    database.clear_specialty_cache()
+    database._DOCTOR_BY_NAME.clear()
+
+
+@pytest.fixture
+def specialties(monkeypatch):
+    rows = [SimpleNamespace(name="Cardiology"), SimpleNamespace(name="Neurology")]
+    calls = []
+
+    async def get_all_specialties():
+        calls.append(1)
+        return list(rows)
+
+    monkeypatch.setattr(database, "get_all_specialties", get_all_specialties)
+    return SimpleNamespace(rows=rows, calls=calls)
+
+
+@pytest.mark.asyncio
+async def test_specialty_options_are_cached(specialties):
+    assert await database.get_specialty_options() == "Cardiology, Neurology"
+    assert await database.get_specialty_options() == "Cardiology, Neurology"
+    assert len(specialties.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_specialty_options_expire(specialties, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(database.time, "monotonic", lambda: clock[0])
+
+    await database.get_specialty_options(ttl=10)
+    specialties.rows.append(SimpleNamespace(name="Dermatology"))
+    clock[0] += 5
+    assert await database.get_specialty_options(ttl=10) == "Cardiology, Neurology"
+    clock[0] += 10
+    assert await database.get_specialty_options(ttl=10) == "Cardiology, Neurology, Dermatology"
+
+
+@pytest.mark.asyncio
+async def test_clear_specialty_cache_forces_reload(specialties):
+    await database.get_specialty_options()
+    specialties.rows.append(SimpleNamespace(name="Dermatology"))
+    database.clear_specialty_cache()
+    assert await database.get_specialty_options() == "Cardiology, Neurology, Dermatology"
+
+
+@pytest.mark.asyncio
+async def test_empty_specialty_list_is_not_cached(specialties):
+    rows = list(specialties.rows)
+    specialties.rows.clear()
+    assert await database.get_specialty_options() == ""
+    specialties.rows.extend(rows)
+    assert await database.get_specialty_options() == "Cardiology, Neurology"
+
+
+@pytest.mark.asyncio
+async def test_lookup_caches_hits_by_normalized_name(monkeypatch):
+    calls = []
+
+    async def find_specialty_by_name(name):
+        calls.append(name)
+        return SimpleNamespace(name="Cardiology") if "cardio" in name.lower() else None
+
+    monkeypatch.setattr(database, "find_specialty_by_name", find_specialty_by_name)
+
+    first = await database.find_specialty_cached("Cardiology")
+    assert await database.find_specialty_cached("  cardiology ") is first
+    assert await database.find_specialty_cached("Podiatry") is None
+    assert await database.find_specialty_cached("Podiatry") is None
+    assert calls == ["Cardiology", "Podiatry", "Podiatry"]
+
+
+@pytest.mark.asyncio
+async def test_doctor_lookups_expire(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(database.time, "monotonic", lambda: clock[0])
+    doctors = {"dr. smith": SimpleNamespace(id=1, name="Dr. Smith")}
+    calls = []
+
+    async def find_doctor_by_name(name):
+        calls.append(name)
+        return doctors.get(name.lower())
+
+    monkeypatch.setattr(database, "find_doctor_by_name", find_doctor_by_name)
+
+    assert (await database.find_doctor_cached("Dr. Smith")).id == 1
+    doctors["dr. smith"] = SimpleNamespace(id=2, name="Dr. Smith")
+    clock[0] += database.LOOKUP_CACHE_TTL - 1
+    assert (await database.find_doctor_cached("Dr. Smith")).id == 1
+    clock[0] += 1
+    assert (await database.find_doctor_cached("Dr. Smith")).id == 2
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_add_doctor_clears_doctor_lookups(memory_db):
+    specialty = await database.add_specialty("Cardiology")
+    await database.add_doctor("Dr. Smith", specialty.id)
+
+    found = await database.find_doctor_cached("Smith")
+    assert found.name == "Dr. Smith"
+    assert database._DOCTOR_BY_NAME
+
+    await database.add_doctor("Dr. Jones", specialty.id)
+    assert not database._DOCTOR_BY_NAME
+
+
+@pytest.mark.asyncio
+async def test_add_specialty_clears_specialty_cache(memory_db):
+    await database.add_specialty("Cardiology")
+    assert await database.get_specialty_options() == "Cardiology"
+    await database.add_specialty("Neurology")
+    assert await database.get_specialty_options() == "Cardiology, Neurology"
@@ -0,0 +1,146 @@
+import pytest
+from livekit.agents import DEFAULT_API_CONNECT_OPTIONS, llm
+
+import api
+from llm_cache import CACHEABLE_STAGES, CachedLLM, InMemoryBackend, LLMCache
+
+
+def _chat_ctx(*texts):
+    ctx = llm.ChatContext()
+    ctx.append(role="system", text="You are a clinic receptionist.")
+    for text in texts:
+        ctx.append(role="user", text=text)
+    return ctx
+
+
+class FakeStream(llm.LLMStream):
+    def __init__(self, fake_llm, *, chat_ctx, fnc_ctx, conn_options):
+        super().__init__(fake_llm, chat_ctx=chat_ctx, fnc_ctx=fnc_ctx, conn_options=conn_options)
+        self._fake_llm = fake_llm
+
+    async def _run(self):
+        self._fake_llm.calls += 1
+        self._event_ch.send_nowait(llm.ChatChunk(
+            request_id="r1",
+            choices=[llm.Choice(delta=llm.ChoiceDelta(role="assistant", content="Thank you, Jane."))],
+        ))
+        info = self._fnc_ctx.ai_functions["register_patient"]
+        call = llm.FunctionCallInfo(
+            tool_call_id="call_1",
+            function_info=info,
+            raw_arguments='{"name": "Jane", "date_of_birth": "1985-03-14"}',
+            arguments={"name": "Jane", "date_of_birth": "1985-03-14"},
+        )
+        self._function_calls_info.append(call)
+        self._event_ch.send_nowait(llm.ChatChunk(
+            request_id="r1",
+            choices=[llm.Choice(delta=llm.ChoiceDelta(role="assistant", tool_calls=[call]))],
+        ))
+
+
+class FakeLLM(llm.LLM):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def chat(self, *, chat_ctx, conn_options=DEFAULT_API_CONNECT_OPTIONS, fnc_ctx=None,
+             temperature=None, n=None, parallel_tool_calls=None, tool_choice=None):
+        return FakeStream(self, chat_ctx=chat_ctx, fnc_ctx=fnc_ctx, conn_options=conn_options)
+
+
+async def _collect(stream):
+    content, calls = [], []
+    async with stream:
+        async for chunk in stream:
+            for choice in chunk.choices:
+                if choice.delta.content:
+                    content.append(choice.delta.content)
+                if choice.delta.tool_calls:
+                    calls.extend(choice.delta.tool_calls)
+    return "".join(content), calls
+
+
+def test_make_key_is_stable_and_ignores_tool_order():
+    key = LLMCache.make_key("gpt-4o", "initial", _chat_ctx("Hi"), ["a", "b"])
+    assert key == LLMCache.make_key("gpt-4o", "initial", _chat_ctx("Hi"), ["b", "a"])
+    assert len(key) == 64
+
+
+def test_make_key_covers_model_stage_and_messages():
+    key = LLMCache.make_key("gpt-4o", "initial", _chat_ctx("Hi"), ["a"])
+    assert key != LLMCache.make_key("gpt-4o-mini", "initial", _chat_ctx("Hi"), ["a"])
+    assert key != LLMCache.make_key("gpt-4o", "basic_info_collected", _chat_ctx("Hi"), ["a"])
+    assert key != LLMCache.make_key("gpt-4o", "initial", _chat_ctx("Hello"), ["a"])
+    assert key != LLMCache.make_key("gpt-4o", "initial", _chat_ctx("Hi"), ["a", "b"])
+
+
+def test_make_key_skips_image_content():
+    ctx = _chat_ctx("Hi")
+    ctx.append(role="user", text="Here is my card", images=[llm.ChatImage(image="https://example.com/card.png")])
+    assert LLMCache.make_key("gpt-4o", "initial", ctx, ["a"]) is None
+
+
+@pytest.mark.asyncio
+async def test_in_memory_backend_evicts_least_recently_used():
+    backend = InMemoryBackend(maxsize=2)
+    await backend.set("a", {"v": 1})
+    await backend.set("b", {"v": 2})
+    assert await backend.get("a") == {"v": 1}
+    await backend.set("c", {"v": 3})
+
+    assert await backend.get("b") is None
+    assert await backend.get("a") == {"v": 1}
+    assert await backend.get("c") == {"v": 3}
+
+
+@pytest.mark.asyncio
+async def test_replays_cached_turn_bound_to_the_new_session():
+    inner = FakeLLM()
+    cached = CachedLLM(inner, model="gpt-4o", temperature=0)
+
+    first_ctx = api.ClinicMateFunctions()
+    assert first_ctx.registration_stage in CACHEABLE_STAGES
+    content, calls = await _collect(cached.chat(chat_ctx=_chat_ctx("I'm Jane"), fnc_ctx=first_ctx))
+    assert inner.calls == 1
+
+    second_ctx = api.ClinicMateFunctions()
+    stream = cached.chat(chat_ctx=_chat_ctx("I'm Jane"), fnc_ctx=second_ctx)
+    replayed_content, replayed_calls = await _collect(stream)
+
+    assert inner.calls == 1
+    assert replayed_content == content == "Thank you, Jane."
+    [call] = replayed_calls
+    assert call.function_info.name == "register_patient"
+    assert call.arguments == {"name": "Jane", "date_of_birth": "1985-03-14"}
+    assert call.tool_call_id != calls[0].tool_call_id
+    # The replayed call runs against the second session, not the one that filled the cache
+    assert call.function_info.callable.__self__ is second_ctx
+    assert stream.function_calls == replayed_calls
+
+
+@pytest.mark.asyncio
+async def test_falls_back_when_a_cached_tool_is_missing():
+    inner = FakeLLM()
+    cache = LLMCache()
+    cached = CachedLLM(inner, model="gpt-4o", temperature=0, cache=cache)
+    fnc_ctx = api.ClinicMateFunctions()
+    key = LLMCache.make_key("gpt-4o", "initial", _chat_ctx("Hi"), fnc_ctx.ai_functions)
+    await cache.set(key, {"content": "", "tool_calls": [{"name": "no_such_tool", "raw_arguments": "{}", "arguments": {}}]})
+
+    await _collect(cached.chat(chat_ctx=_chat_ctx("Hi"), fnc_ctx=fnc_ctx))
+    assert inner.calls == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("temperature, stage_advanced", [(0.7, False), (0, True)])
+async def test_only_deterministic_early_turns_are_cached(temperature, stage_advanced):
+    inner = FakeLLM()
+    cached = CachedLLM(inner, model="gpt-4o", temperature=temperature)
+
+    for _ in range(2):
+        fnc_ctx = api.ClinicMateFunctions()
+        if stage_advanced:
+            fnc_ctx._advance_stage(api.RegistrationState.COMPLAINT)
+        await _collect(cached.chat(chat_ctx=_chat_ctx("Hi"), fnc_ctx=fnc_ctx))
+
+    assert inner.calls == 2
@@ -0,0 +1,65 @@
+from datetime import date
+
+import pytest
+
+import api
+from utils import parse_date_of_birth
+
+
+@pytest.mark.parametrize("spoken, expected", [
+    ("1985-03-14", "1985-03-14"),
+    ("03/14/1985", "1985-03-14"),
+    ("March 14, 1985", "1985-03-14"),
+    (" March 14, 1985 ", "1985-03-14"),
+    ("the fourteenth of March", "the fourteenth of March"),
+])
+def test_canonical_dob(spoken, expected):
+    assert api._canonical_dob(spoken) == expected
+
+
+def test_parse_date_of_birth():
+    assert parse_date_of_birth("1985-03-14") == date(1985, 3, 14)
+    assert parse_date_of_birth("03/14/1985") == date(1985, 3, 14)
+    assert parse_date_of_birth("March 14, 1985") == date(1985, 3, 14)
+    assert parse_date_of_birth("not a date") is None
+    assert parse_date_of_birth("") is None
+
+
+@pytest.mark.parametrize("spoken, expected", [
+    ("555-123-4567", "(555) 123-4567"),
+    ("5551234567", "(555) 123-4567"),
+    ("+1 (555) 123 4567", "(555) 123-4567"),
+    (" 123-4567 ", "123-4567"),
+    ("+44 20 7946 0958", "+44 20 7946 0958"),
+])
+def test_canonical_phone(spoken, expected):
+    assert api._canonical_phone(spoken) == expected
+
+
+def test_canonical_email():
+    assert api._canonical_email("  Jane.Doe@Example.COM ") == "jane.doe@example.com"
+
+
+@pytest.mark.asyncio
+async def test_register_patient_stores_canonical_dob():
+    fnc = api.ClinicMateFunctions()
+    await fnc.register_patient(name="Jane Doe", date_of_birth="March 14, 1985")
+    assert fnc.date_of_birth == "1985-03-14"
+
+
+@pytest.mark.asyncio
+async def test_collected_contact_details_are_canonical():
+    fnc = api.ClinicMateFunctions()
+    await fnc.collect_phone(phone_number="555.123.4567")
+    await fnc.collect_email(email="Jane@Example.com")
+    assert fnc.phone_number == "(555) 123-4567"
+    assert fnc.email == "jane@example.com"
+
+
+@pytest.mark.asyncio
+async def test_update_specific_info_normalizes():
+    fnc = api.ClinicMateFunctions()
+    await fnc.update_specific_info(field="DOB", value="03/14/1985")
+    await fnc.update_specific_info(field="phone", value="(555)1234567")
+    assert fnc.date_of_birth == "1985-03-14"
+    assert fnc.phone_number == "(555) 123-4567"
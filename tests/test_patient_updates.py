@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+
+import pytest
+
+import database
+
+
+@pytest.fixture
+def updates(monkeypatch):
+    calls = []
+
+    async def update_patient(patient_id, patient_data):
+        calls.append((patient_id, patient_data.model_dump(exclude_unset=True)))
+        return SimpleNamespace(id=patient_id)
+
+    monkeypatch.setattr(database, "update_patient", update_patient)
+    return calls
+
+
+def _ctx(**fields):
+    values = dict(
+        insurance_provider=None, insurance_id=None, has_referral=False, referred_physician=None,
+        medical_complaint=None, address=None, phone_number=None, email=None,
+    )
+    values.update(fields)
+    return SimpleNamespace(**values)
+
+
+@pytest.mark.asyncio
+async def test_insurance_update_needs_provider_and_id(updates):
+    columns = database.PATIENT_UPDATE_COLUMNS["collect_insurance_info"]
+
+    assert not await database.update_patient_from_context(1, _ctx(insurance_provider="Aetna"), columns)
+    assert not await database.update_patient_from_context(1, _ctx(insurance_id="A123"), columns)
+    assert updates == []
+
+    ctx = _ctx(insurance_provider="Aetna", insurance_id="A123")
+    assert await database.update_patient_from_context(1, ctx, columns)
+    assert updates == [(1, {
+        "insurance_provider": "Aetna",
+        "insurance_id": "A123",
+        "has_referral": False,
+        "referred_physician": None,
+    })]
+
+
+@pytest.mark.asyncio
+async def test_single_field_updates(updates):
+    columns = database.PATIENT_UPDATE_COLUMNS["collect_phone"]
+
+    assert not await database.update_patient_from_context(2, _ctx(), columns)
+    assert await database.update_patient_from_context(2, _ctx(phone_number="(555) 123-4567"), columns)
+    assert updates == [(2, {"phone": "(555) 123-4567"})]
+
+
+@pytest.mark.asyncio
+async def test_declined_email_is_not_a_failure(updates):
+    columns = database.PATIENT_UPDATE_COLUMNS["collect_email"]
+
+    assert await database.update_patient_from_context(3, _ctx(email=None), columns)
+    assert await database.update_patient_from_context(3, _ctx(email="jane@example.com"), columns)
+    assert updates == [(3, {"email": None}), (3, {"email": "jane@example.com"})]
@@ -0,0 +1,71 @@
+import pytest
+
+import api
+from api import RegistrationState
+
+
+@pytest.fixture
+def fnc():
+    return api.ClinicMateFunctions()
+
+
+def test_starts_initial(fnc):
+    assert fnc.state == RegistrationState.INITIAL
+    assert fnc.registration_stage == "initial"
+    assert not fnc.is_confirmed
+    assert not fnc.is_registered
+
+
+def test_advance_stage_moves_in_any_order(fnc):
+    fnc._advance_stage(RegistrationState.PHONE)
+    assert fnc.registration_stage == "phone_collected"
+    fnc._advance_stage(RegistrationState.INSURANCE)
+    assert fnc.registration_stage == "insurance_collected"
+
+
+def test_advance_stage_does_not_reopen_a_registration(fnc):
+    fnc._advance_stage(RegistrationState.REGISTERED)
+    fnc._advance_stage(RegistrationState.PHONE)
+    assert fnc.state == RegistrationState.REGISTERED
+    assert fnc.is_registered
+
+
+def test_advance_stage_logs_each_transition_once(fnc, caplog):
+    with caplog.at_level("INFO", logger="hospital-registration"):
+        fnc._advance_stage(RegistrationState.BASIC, name="Jane")
+        fnc._advance_stage(RegistrationState.BASIC, name="Jane")
+    transitions = [r for r in caplog.records if r.getMessage().startswith("Stage ")]
+    assert len(transitions) == 1
+    assert transitions[0].from_stage == "initial"
+    assert transitions[0].to_stage == "basic_info_collected"
+
+
+@pytest.mark.asyncio
+async def test_confirmation_completes_registration(fnc):
+    fnc._advance_stage(RegistrationState.CONTACT)
+    await fnc.confirm_information(confirmed=True)
+    assert fnc.is_confirmed
+    assert fnc.is_registered
+    assert fnc.registration_stage == "registration_complete"
+
+
+@pytest.mark.asyncio
+async def test_rejected_confirmation_reopens_registration(fnc):
+    fnc._advance_stage(RegistrationState.REGISTERED)
+    reply = await fnc.confirm_information(confirmed=False)
+    assert reply == api._MSG_ASK_CORRECTION
+    assert not fnc.is_confirmed
+    assert not fnc.is_registered
+    assert fnc.state == RegistrationState.CONTACT
+
+    # Corrections are accepted and a new confirmation completes the registration again
+    await fnc.update_specific_info(field="phone", value="555-123-4567")
+    await fnc.confirm_information(confirmed=True)
+    assert fnc.is_registered
+
+
+@pytest.mark.asyncio
+async def test_rejected_confirmation_keeps_earlier_progress(fnc):
+    fnc._advance_stage(RegistrationState.INSURANCE)
+    await fnc.confirm_information(confirmed=False)
+    assert fnc.state == RegistrationState.INSURANCE
@@ -0,0 +1,103 @@
+import asyncio
+from email.message import EmailMessage
+
+import aiosmtplib
+import pytest
+
+from utils import email_utils
+
+
+class FakeSMTP:
+    instances = []
+
+    def __init__(self, hostname, port, use_tls):
+        self.is_connected = False
+        self.connects = 0
+        self.sent = []
+        self.quit_called = False
+        self.drop_next_send = False
+        FakeSMTP.instances.append(self)
+
+    async def connect(self):
+        self.is_connected = True
+        self.connects += 1
+
+    async def login(self, username, password):
+        pass
+
+    async def send_message(self, message, sender, recipients):
+        if self.drop_next_send:
+            self.drop_next_send = False
+            raise aiosmtplib.SMTPServerDisconnected("closed")
+        self.sent.append(recipients)
+
+    async def quit(self):
+        self.quit_called = True
+        self.is_connected = False
+
+    def close(self):
+        self.is_connected = False
+
+
+@pytest.fixture(autouse=True)
+def fake_smtp(monkeypatch):
+    FakeSMTP.instances = []
+    monkeypatch.setattr(email_utils.aiosmtplib, "SMTP", FakeSMTP)
+
+
+def _message():
+    message = EmailMessage()
+    message["Subject"] = "Test"
+    return message
+
+
+@pytest.mark.asyncio
+async def test_connections_are_reused():
+    pool = email_utils.SmtpPool(size=1)
+    await pool.send("a@example.com", "pw", "b@example.com", _message())
+    await pool.send("a@example.com", "pw", "c@example.com", _message())
+
+    [smtp] = FakeSMTP.instances
+    assert smtp.connects == 1
+    assert smtp.sent == [["b@example.com"], ["c@example.com"]]
+
+
+@pytest.mark.asyncio
+async def test_reconnects_once_when_server_disconnected():
+    pool = email_utils.SmtpPool(size=1)
+    await pool.send("a@example.com", "pw", "b@example.com", _message())
+    smtp = FakeSMTP.instances[0]
+    smtp.drop_next_send = True
+
+    await pool.send("a@example.com", "pw", "c@example.com", _message())
+    assert smtp.connects == 2
+    assert smtp.sent == [["b@example.com"], ["c@example.com"]]
+
+
+@pytest.mark.asyncio
+async def test_close_quits_open_connections_and_resets():
+    pool = email_utils.SmtpPool(size=2)
+    await pool.send("a@example.com", "pw", "b@example.com", _message())
+    await pool.close()
+
+    assert [smtp.quit_called for smtp in FakeSMTP.instances] == [True, False]
+
+    # The next send starts a fresh pool
+    await pool.send("a@example.com", "pw", "b@example.com", _message())
+    assert len(FakeSMTP.instances) == 4
+
+
+def test_pool_is_rebuilt_for_a_new_event_loop():
+    pool = email_utils.SmtpPool(size=1)
+    asyncio.run(pool.send("a@example.com", "pw", "b@example.com", _message()))
+    asyncio.run(pool.send("a@example.com", "pw", "b@example.com", _message()))
+    assert len(FakeSMTP.instances) == 2
+
+
+@pytest.mark.asyncio
+async def test_send_email_async_reports_failure(monkeypatch):
+    async def fail(*args):
+        raise aiosmtplib.SMTPAuthenticationError(535, "bad credentials")
+
+    monkeypatch.setattr(email_utils._smtp_pool, "send", fail)
+    assert not await email_utils.send_email_async("a@example.com", "pw", "b@example.com", _message())
@@ -0,0 +1,41 @@
+import queue
+import threading
+import time
+
+import re
+from datetime import datetime
+
+import agent
+import call_processor
+
+
+def _wait_for(path, text, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if path.exists() and path.read_text() == text:
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_lines_reach_disk_before_the_call_ends(tmp_path):
+    path = tmp_path / "transcript.log"
+    log_queue = queue.Queue()
+    writer = threading.Thread(target=agent.write_transcription, args=(str(path), log_queue), daemon=True)
+    writer.start()
+    try:
+        log_queue.put("[2026-10-15 09:00:00] USER: Hi\n\n")
+        assert _wait_for(path, "[2026-10-15 09:00:00] USER: Hi\n\n")
+        log_queue.put("[2026-10-15 09:00:01] AGENT: Hello\n\n")
+        assert _wait_for(path, "[2026-10-15 09:00:00] USER: Hi\n\n[2026-10-15 09:00:01] AGENT: Hello\n\n")
+    finally:
+        log_queue.put(None)
+        writer.join(timeout=2.0)
+    assert not writer.is_alive()
+
+
+def test_call_processor_lines_match_the_agent_transcript_format():
+    ts = datetime(2026, 10, 15, 9, 0, 0, 123456).strftime(call_processor._TRANSCRIPT_TS_FMT)
+    assert ts == "2026-10-15 09:00:00"
+    assert re.fullmatch(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}", agent.now_str())
+    assert call_processor._SYSTEM_FMT(ts=ts, c="CALL SUMMARY:\nok") == agent.SYSTEM_FMT(ts=ts, c="CALL SUMMARY:\nok")
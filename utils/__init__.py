@@ -13,7 +13,10 @@ from utils.email_utils import (
     create_email_message,
     generate_html_email,
     get_email_credentials,
-    send_email_sync
+    get_email_recipient,
+    send_email_sync,
+    send_email_async,
+    close_email_connections
 )
 
 from utils.summary_utils import (
@@ -27,6 +30,7 @@ from utils.summary_utils import (
 
 from utils.extraction_utils import (
     extract_data_from_conversation,
+    extract_fields_from_conversation,
     extract_multiple_data_types,
     extract_all_patient_data,
     clean_extracted_data
@@ -45,15 +49,16 @@ __all__ = [
     'parse_date_time', 'format_date_for_display', 'is_date_in_future', 'parse_date_of_birth',
     
     # Email utilities
-    'create_email_message', 'generate_html_email', 'get_email_credentials', 'send_email_sync',
+    'create_email_message', 'generate_html_email', 'get_email_credentials', 'get_email_recipient', 'send_email_sync',
+    'send_email_async', 'close_email_connections',
     
     # Summary utilities
     'generate_patient_info_section', 'generate_insurance_section', 'generate_medical_section',
     'generate_appointment_section', 'generate_registration_status', 'generate_call_summary',
     
     # Extraction utilities
-    'extract_data_from_conversation', 'extract_multiple_data_types', 'extract_all_patient_data',
-    'clean_extracted_data',
+    'extract_data_from_conversation', 'extract_fields_from_conversation', 'extract_multiple_data_types',
+    'extract_all_patient_data', 'clean_extracted_data',
     
     # Appointment utilities
     'format_appointment_details', 'create_pending_appointment', 
@@ -2,8 +2,9 @@
 Utility functions for handling dates and times throughout the application.
 """
 
+import functools
 import logging
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, List, Tuple
 
 logger = logging.getLogger("date-utils")
@@ -22,6 +23,12 @@ DATE_FORMATS = [
     "%Y-%m-%d",                   # 2023-01-01 (defaults to 9:00 AM)
 ]
 
+# Date of birth formats tried after ISO (YYYY-MM-DD)
+DOB_FORMATS = (
+    "%m/%d/%Y",     # MM/DD/YYYY
+    "%B %d, %Y",    # Month DD, YYYY
+)
+
 # Month names to number mapping for natural language processing
 MONTH_MAPPING = {
     "january": 1, "february": 2, "march": 3, "april": 4,
@@ -115,30 +122,33 @@ def is_date_in_future(dt: datetime) -> bool:
     """
     return dt > datetime.now()
 
-def parse_date_of_birth(dob_str: str) -> Optional[datetime.date]:
+@functools.lru_cache(maxsize=1024)
+def parse_date_of_birth(dob_str: str) -> Optional[date]:
     """
     Parse a date of birth string into a date object
     
+    Results are cached, since the same DOB is parsed at registration and again at call end.
+    
     Args:
         dob_str: The date of birth string to parse
         
     Returns:
         Parsed date or None if parsing fails
     """
-    try:
-        # Try common formats for DOB
-        for fmt in [
-            "%m/%d/%Y",     # MM/DD/YYYY
-            "%Y-%m-%d",     # YYYY-MM-DD
-            "%B %d, %Y"     # Month DD, YYYY
-        ]:
-            try:
-                return datetime.strptime(dob_str, fmt).date()
-            except ValueError:
-                continue
-        
-        # If standard formats fail, return None
+    if not dob_str:
         return None
-    except Exception as e:
-        logger.error(f"Error parsing date of birth: {str(e)}")
-        return None 
\ No newline at end of file
+    
+    # Stored DOBs are canonical YYYY-MM-DD, which fromisoformat handles directly
+    try:
+        return date.fromisoformat(dob_str)
+    except ValueError:
+        pass
+    
+    for fmt in DOB_FORMATS:
+        try:
+            return datetime.strptime(dob_str, fmt).date()
+        except ValueError:
+            continue
+    
+    # If standard formats fail, return None
+    return None
@@ -2,11 +2,15 @@
 Utility functions for email handling, including formatting and sending emails.
 """
 
+import asyncio
+import functools
 import logging
 import smtplib
+import aiosmtplib
 import ssl
 import os
 from email.mime.text import MIMEText
+from email.message import Message
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
 from typing import Dict, Any, Optional, Tuple
@@ -87,10 +91,13 @@ def generate_html_email(content: str, title: str = "Assort Medical Clinic") -> s
     </html>
     """
 
+@functools.lru_cache(maxsize=1)
 def get_email_credentials() -> Tuple[Optional[str], Optional[str]]:
     """
     Get email credentials from environment variables
     
+    Read on the first call, after the agent has loaded .env, and reused afterwards.
+    
     Returns:
         Tuple containing (sender_email, password)
     """
@@ -105,6 +112,16 @@ def get_email_credentials() -> Tuple[Optional[str], Optional[str]]:
     
     return sender_email, password
 
+@functools.lru_cache(maxsize=1)
+def get_email_recipient() -> Optional[str]:
+    """
+    Get the address confirmation emails are sent to
+    
+    Returns:
+        The EMAIL_RECIPIENT environment variable, read once
+    """
+    return os.environ.get("EMAIL_RECIPIENT")
+
 def send_email_sync(
     sender_email: str, 
     password: str, 
@@ -131,4 +148,105 @@ def send_email_sync(
         return True
     except Exception as e:
         logger.error(f"SMTP error: {str(e)}")
-        return False 
\ No newline at end of file
+        return False
+
+class SmtpPool:
+    """
+    Pool of authenticated SMTP connections reused across sends
+    
+    Connections are opened on first use and reopened when the server has
+    dropped them, so an idle pool holds no sockets. The pool belongs to the
+    event loop that first uses it; close() logs out and releases it.
+    """
+    
+    def __init__(self, size: int = 5, hostname: str = "smtp.gmail.com", port: int = 465):
+        self._size = size
+        self._hostname = hostname
+        self._port = port
+        self._idle: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def _queue(self) -> asyncio.Queue:
+        # Created on first use so it belongs to the running event loop; connections
+        # left over from a loop that has since gone away are abandoned
+        loop = asyncio.get_running_loop()
+        if self._idle is None or self._loop is not loop:
+            self._loop = loop
+            self._idle = asyncio.Queue()
+            for _ in range(self._size):
+                self._idle.put_nowait(aiosmtplib.SMTP(hostname=self._hostname, port=self._port, use_tls=True))
+        return self._idle
+    
+    async def send(self, sender_email: str, password: str, recipient_email: str, message: Message) -> None:
+        """
+        Send a message on a pooled connection, waiting for one if all are busy
+        
+        Args:
+            sender_email: Email address of the sender
+            password: Password for the sender's email account
+            recipient_email: Email address of the recipient
+            message: The email message to send
+        """
+        queue = self._queue()
+        smtp = await queue.get()
+        try:
+            try:
+                if not smtp.is_connected:
+                    await smtp.connect()
+                    await smtp.login(sender_email, password)
+                await smtp.send_message(message, sender=sender_email, recipients=[recipient_email])
+            except aiosmtplib.SMTPServerDisconnected:
+                # The server closed the idle connection; reconnect once
+                smtp.close()
+                await smtp.connect()
+                await smtp.login(sender_email, password)
+                await smtp.send_message(message, sender=sender_email, recipients=[recipient_email])
+        except Exception:
+            smtp.close()
+            raise
+        finally:
+            queue.put_nowait(smtp)
+    
+    async def close(self) -> None:
+        """Log out of every open connection, waiting for sends in progress to finish"""
+        if self._idle is None or self._loop is not asyncio.get_running_loop():
+            return
+        idle, self._idle, self._loop = self._idle, None, None
+        for _ in range(self._size):
+            smtp = await idle.get()
+            if smtp.is_connected:
+                try:
+                    await smtp.quit()
+                except Exception:
+                    smtp.close()
+
+_smtp_pool = SmtpPool()
+
+async def close_email_connections() -> None:
+    """Log out of the pooled SMTP connections; call once queued emails have been sent"""
+    await _smtp_pool.close()
+
+async def send_email_async(
+    sender_email: str,
+    password: str,
+    recipient_email: str,
+    message: Message
+) -> bool:
+    """
+    Send an email over a pooled SMTP connection without blocking the event loop
+    
+    Args:
+        sender_email: Email address of the sender
+        password: Password for the sender's email account
+        recipient_email: Email address of the recipient
+        message: The email message to send
+        
+    Returns:
+        True if the email was sent successfully, False otherwise
+    """
+    try:
+        await _smtp_pool.send(sender_email, password, recipient_email, message)
+        return True
+    except Exception as e:
+        logger.error(f"SMTP error: {str(e)}")
+        return False
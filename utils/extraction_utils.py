@@ -4,7 +4,7 @@ Utility functions for extracting information from conversation history.
 
 import logging
 import re
-from typing import Dict, List, Optional, Any, Union
+from typing import Dict, List, Optional, Any, Tuple, Union
 
 logger = logging.getLogger("extraction-utils")
 logger.setLevel(logging.INFO)
@@ -99,6 +99,52 @@ def extract_data_from_conversation(
     logger.warning(f"Could not extract {data_type} from conversation history")
     return None
 
+def extract_fields_from_conversation(
+    conversation: List[Dict[str, str]], 
+    fields: Tuple[str, ...]
+) -> Dict[str, Optional[str]]:
+    """
+    Extract several types of information from conversation history in a single pass
+    
+    Args:
+        conversation: List of conversation messages with 'role' and 'content' keys
+        fields: Types of data to extract (name, dob, phone, email, etc.)
+        
+    Returns:
+        Dictionary of extracted information by data type (None if not found)
+    """
+    results = dict.fromkeys(fields)
+    pending = []
+    
+    for data_type in fields:
+        if data_type in PATTERNS:
+            pending.append(data_type)
+        else:
+            logger.warning(f"Unknown data type for extraction: {data_type}")
+    
+    # Walk the history once, checking every still-missing field against each user message
+    for msg in conversation:
+        if not pending:
+            break
+        if msg.get("role") != "user":
+            continue
+        
+        message = msg["content"]
+        for data_type in tuple(pending):
+            for pattern in PATTERNS[data_type]:
+                match = re.search(pattern, message)
+                if match:
+                    extracted = match.group(1).strip()
+                    logger.info(f"Extracted {data_type} from conversation: {extracted}")
+                    results[data_type] = extracted
+                    pending.remove(data_type)
+                    break
+    
+    for data_type in pending:
+        logger.warning(f"Could not extract {data_type} from conversation history")
+    
+    return results
+
 def extract_multiple_data_types(
     conversation: List[Dict[str, str]], 
     data_types: List[str]
@@ -4,11 +4,22 @@ Utility functions for generating summary information and reports.
 
 import logging
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List, Optional
 
 logger = logging.getLogger("summary-utils")
 logger.setLevel(logging.INFO)
 
+# Any of these keys means the insurance section is shown
+_INSURANCE_KEYS = ('insurance_provider', 'insurance_id', 'has_referral')
+
+# Fixed summary text
+_SUMMARY_HEADER = "Thank you for calling Assort Medical Clinic. Here is a summary of your call: \n"
+_DEFAULT_LOCATION = "Assort Medical Clinic Main Campus"
+_ARRIVAL_REMINDER = "- Please arrive 15 minutes early and bring your insurance card and ID."
+_STATUS_COMPLETED = "- Status: Completed"
+_STATUS_IN_PROGRESS = "- Status: In progress ({})".format
+_TIMESTAMP_FMT = "%Y-%m-%d %H:%M:%S"
+
 def generate_patient_info_section(patient_data: Dict[str, Any]) -> str:
     """
     Generate the patient information section of the summary
@@ -20,10 +31,15 @@ def generate_patient_info_section(patient_data: Dict[str, Any]) -> str:
         Formatted patient information section
     """
     patient_name = patient_data.get('patient_name', 'Unknown')
+    dob = patient_data.get('date_of_birth')
+    phone = patient_data.get('phone_number')
+    email = patient_data.get('email')
+    address = patient_data.get('address')
+    patient_id = patient_data.get('patient_id')
     
     # Check if we have critical patient information
-    has_name = patient_data.get('patient_name') and patient_data['patient_name'].strip() != ""
-    has_dob = patient_data.get('date_of_birth') and patient_data['date_of_birth'].strip() != ""
+    has_name = 'patient_name' in patient_data and patient_name and patient_name.strip() != ""
+    has_dob = dob and dob.strip() != ""
     
     summary = []
     
@@ -42,22 +58,22 @@ def generate_patient_info_section(patient_data: Dict[str, Any]) -> str:
     summary.append(f"- Name: {patient_name}")
     
     if has_dob:
-        summary.append(f"- Date of Birth: {patient_data.get('date_of_birth', 'Not provided')}")
+        summary.append(f"- Date of Birth: {dob}")
     else:
         summary.append("- Date of Birth: Not provided")
     
-    if patient_data.get('phone_number'):
-        summary.append(f"- Phone: {patient_data['phone_number']}")
+    if phone:
+        summary.append(f"- Phone: {phone}")
     
-    if patient_data.get('email'):
-        summary.append(f"- Email: {patient_data['email']}")
+    if email:
+        summary.append(f"- Email: {email}")
     
-    if patient_data.get('address'):
-        summary.append(f"- Address: {patient_data['address']}")
+    if address:
+        summary.append(f"- Address: {address}")
     
     # Add database information if available
-    if patient_data.get('patient_id'):
-        summary.append(f"- Patient ID: {patient_data['patient_id']} (Successfully saved to database)")
+    if patient_id:
+        summary.append(f"- Patient ID: {patient_id} (Successfully saved to database)")
     else:
         if has_name and has_dob:
             summary.append("- Database Status: Not saved to database (Error occurred)")
@@ -76,23 +92,27 @@ def generate_insurance_section(patient_data: Dict[str, Any]) -> str:
     Returns:
         Formatted insurance information section
     """
-    if not any(k in patient_data for k in ['insurance_provider', 'insurance_id', 'has_referral']):
+    if not any(k in patient_data for k in _INSURANCE_KEYS):
         return ""
     
+    provider = patient_data.get('insurance_provider')
+    insurance_id = patient_data.get('insurance_id')
+    
     summary = ["\nINSURANCE INFORMATION"]
     
-    if patient_data.get('insurance_provider'):
-        summary.append(f"- Provider: {patient_data['insurance_provider']}")
+    if provider:
+        summary.append(f"- Provider: {provider}")
     
-    if patient_data.get('insurance_id'):
-        summary.append(f"- Insurance ID: {patient_data['insurance_id']}")
+    if insurance_id:
+        summary.append(f"- Insurance ID: {insurance_id}")
     
     if 'has_referral' in patient_data:
-        referral_status = "Yes" if patient_data['has_referral'] else "No"
-        summary.append(f"- Has Referral: {referral_status}")
+        has_referral = patient_data['has_referral']
+        summary.append(f"- Has Referral: {'Yes' if has_referral else 'No'}")
         
-        if patient_data.get('has_referral') and patient_data.get('referred_physician'):
-            summary.append(f"- Referred By: {patient_data['referred_physician']}")
+        referred_physician = patient_data.get('referred_physician')
+        if has_referral and referred_physician:
+            summary.append(f"- Referred By: {referred_physician}")
     
     return "\n".join(summary)
 
@@ -106,11 +126,12 @@ def generate_medical_section(patient_data: Dict[str, Any]) -> str:
     Returns:
         Formatted medical information section
     """
-    if not patient_data.get('medical_complaint'):
+    complaint = patient_data.get('medical_complaint')
+    if not complaint:
         return ""
     
     summary = ["\nMEDICAL INFORMATION"]
-    summary.append(f"- Complaint: {patient_data['medical_complaint']}")
+    summary.append(f"- Complaint: {complaint}")
     
     return "\n".join(summary)
 
@@ -124,11 +145,16 @@ def generate_appointment_section(patient_data: Dict[str, Any]) -> str:
     Returns:
         Formatted appointment information section
     """
+    appointment_id = patient_data.get('appointment_id')
+    details = patient_data.get('appointment_details')
+    specialty_preference = patient_data.get('specialty_preference')
+    doctor_preference = patient_data.get('doctor_preference')
+    
     # Check if we have any appointment information
     has_appointment_info = (patient_data.get('wants_appointment') or 
-                           patient_data.get('appointment_details') or 
-                           patient_data.get('doctor_preference') or
-                           patient_data.get('specialty_preference'))
+                           details or 
+                           doctor_preference or
+                           specialty_preference)
     
     if not has_appointment_info:
         return ""
@@ -136,18 +162,17 @@ def generate_appointment_section(patient_data: Dict[str, Any]) -> str:
     summary = ["\nAPPOINTMENT INFORMATION"]
     
     # Case 1: We have a confirmed appointment with details and ID
-    if patient_data.get('appointment_id') and patient_data.get('appointment_details'):
-        details = patient_data['appointment_details']
+    if appointment_id and details:
         summary.append("- Status: Appointment successfully booked")
-        summary.append(f"- Appointment ID: {patient_data['appointment_id']}")
+        summary.append(f"- Appointment ID: {appointment_id}")
         
         if isinstance(details, dict):
             # Date and time
-            date_time = None
-            if details.get('date_time'):
-                date_time = details['date_time']
-            elif details.get('date') and details.get('time'):
-                date_time = f"{details['date']} at {details['time']}"
+            date_time = details.get('date_time')
+            if not date_time:
+                date = details.get('date')
+                time = details.get('time')
+                date_time = f"{date} at {time}" if date and time else None
             
             if date_time:
                 summary.append(f"- Date & Time: {date_time}")
@@ -156,51 +181,47 @@ def generate_appointment_section(patient_data: Dict[str, Any]) -> str:
             doctor_name = None
             doctor_specialty = None
             
-            if details.get('doctor'):
-                doctor_dict = details['doctor']
-                if isinstance(doctor_dict, dict):
-                    doctor_name = doctor_dict.get('name')
-                    doctor_specialty = doctor_dict.get('specialty')
-            elif details.get('doctor_name'):
-                doctor_name = details['doctor_name']
+            doctor = details.get('doctor')
+            if doctor:
+                if isinstance(doctor, dict):
+                    doctor_name = doctor.get('name')
+                    doctor_specialty = doctor.get('specialty')
+            else:
+                doctor_name = details.get('doctor_name')
             
             if doctor_name:
                 summary.append(f"- Doctor: {doctor_name}")
             
             # Specialty
-            if doctor_specialty:
-                summary.append(f"- Specialty: {doctor_specialty}")
-            elif details.get('specialty'):
-                summary.append(f"- Specialty: {details['specialty']}")
+            specialty = doctor_specialty or details.get('specialty')
+            if specialty:
+                summary.append(f"- Specialty: {specialty}")
             
             # Location
-            if details.get('location'):
-                summary.append(f"- Location: {details['location']}")
-            else:
-                summary.append("- Location: Assort Medical Clinic Main Campus")
+            summary.append(f"- Location: {details.get('location') or _DEFAULT_LOCATION}")
             
             # Duration
-            if details.get('duration_minutes'):
-                summary.append(f"- Duration: {details['duration_minutes']} minutes")
+            duration = details.get('duration_minutes')
+            if duration:
+                summary.append(f"- Duration: {duration} minutes")
         else:
             # If not a dictionary, include as is
             summary.append(f"- Details: {details}")
     
     # Case 2: Appointment is pending/requested but not confirmed
-    elif patient_data.get('appointment_details') and isinstance(patient_data['appointment_details'], dict):
-        details = patient_data['appointment_details']
-        status = details.get('status', 'pending')
-        summary.append(f"- Status: Appointment {status}")
+    elif details and isinstance(details, dict):
+        summary.append(f"- Status: Appointment {details.get('status', 'pending')}")
         
         # Date and time if available
-        if details.get('date_time'):
-            summary.append(f"- Requested Date & Time: {details['date_time']}")
+        date_time = details.get('date_time')
+        if date_time:
+            summary.append(f"- Requested Date & Time: {date_time}")
         
         # Doctor name if available
-        doctor_name = None
-        if details.get('doctor') and isinstance(details['doctor'], dict):
-            doctor_name = details['doctor'].get('name')
-            doctor_specialty = details['doctor'].get('specialty')
+        doctor = details.get('doctor')
+        if doctor and isinstance(doctor, dict):
+            doctor_name = doctor.get('name')
+            doctor_specialty = doctor.get('specialty')
             
             if doctor_name:
                 summary.append(f"- Requested Doctor: {doctor_name}")
@@ -209,20 +230,21 @@ def generate_appointment_section(patient_data: Dict[str, Any]) -> str:
                 summary.append(f"- Specialty: {doctor_specialty}")
         
         # Error information if present
-        if details.get('error'):
-            summary.append(f"- Note: Appointment scheduling needs follow-up: {details['error']}")
+        error = details.get('error')
+        if error:
+            summary.append(f"- Note: Appointment scheduling needs follow-up: {error}")
         
         summary.append("- The clinic will contact you to confirm your appointment details.")
     
     # Case 3: Patient indicated preferences but no appointment was created
-    elif patient_data.get('specialty_preference') or patient_data.get('doctor_preference'):
+    elif specialty_preference or doctor_preference:
         summary.append("- Status: Appointment requested but not confirmed")
         
-        if patient_data.get('specialty_preference'):
-            summary.append(f"- Preferred Specialty: {patient_data['specialty_preference']}")
+        if specialty_preference:
+            summary.append(f"- Preferred Specialty: {specialty_preference}")
         
-        if patient_data.get('doctor_preference'):
-            summary.append(f"- Preferred Doctor: {patient_data['doctor_preference']}")
+        if doctor_preference:
+            summary.append(f"- Preferred Doctor: {doctor_preference}")
         
         summary.append("- The clinic will contact you to schedule your appointment.")
     
@@ -232,7 +254,7 @@ def generate_appointment_section(patient_data: Dict[str, Any]) -> str:
         summary.append("- Please call back to schedule a specific appointment.")
     
     # Add reminder for all appointment cases
-    summary.append("- Please arrive 15 minutes early and bring your insurance card and ID.")
+    summary.append(_ARRIVAL_REMINDER)
     
     return "\n".join(summary)
 
@@ -249,45 +271,35 @@ def generate_registration_status(patient_data: Dict[str, Any]) -> str:
     summary = ["\nREGISTRATION STATUS"]
     
     if patient_data.get('is_registered'):
-        summary.append("- Status: Completed")
+        summary.append(_STATUS_COMPLETED)
     else:
-        stage = patient_data.get('registration_stage', 'Not started')
-        summary.append(f"- Status: In progress ({stage})")
+        summary.append(_STATUS_IN_PROGRESS(patient_data.get('registration_stage', 'Not started')))
     
     return "\n".join(summary)
 
-def generate_call_summary(patient_data: Dict[str, Any]) -> str:
+def _iter_summary_sections(patient_data: Dict[str, Any], now: Optional[datetime]) -> Iterator[str]:
+    """Yield the call summary sections in order, skipping optional ones that are empty"""
+    yield _SUMMARY_HEADER
+    yield generate_patient_info_section(patient_data)
+    
+    for section in (generate_insurance_section(patient_data),
+                    generate_medical_section(patient_data),
+                    generate_appointment_section(patient_data)):
+        if section:
+            yield section
+    
+    yield generate_registration_status(patient_data)
+    yield f"\nGenerated: {(now or datetime.now()).strftime(_TIMESTAMP_FMT)}"
+
+def generate_call_summary(patient_data: Dict[str, Any], now: Optional[datetime] = None) -> str:
     """
     Generate a complete call summary from patient data by combining all sections
     
     Args:
         patient_data: Dictionary containing patient information
+        now: Time to stamp the summary with, defaults to the current time
         
     Returns:
         Formatted call summary as a string
     """
-    # Start with header
-    sections = ["Thank you for calling Assort Medical Clinic. Here is a summary of your call: \n"]
-    
-    # Add each section
-    sections.append(generate_patient_info_section(patient_data))
-    
-    insurance_section = generate_insurance_section(patient_data)
-    if insurance_section:
-        sections.append(insurance_section)
-    
-    medical_section = generate_medical_section(patient_data)
-    if medical_section:
-        sections.append(medical_section)
-    
-    appointment_section = generate_appointment_section(patient_data)
-    if appointment_section:
-        sections.append(appointment_section)
-    
-    sections.append(generate_registration_status(patient_data))
-    
-    # Add timestamp
-    sections.append(f"\nGenerated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    
-    # Combine all sections
-    return "\n".join(sections) 
\ No newline at end of file
+    return "\n".join(_iter_summary_sections(patient_data, now))